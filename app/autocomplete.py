@@ -0,0 +1,132 @@
+import threading
+from bisect import bisect_left
+
+from django.db import connection
+
+from .cache import get_catalog_version
+from .models import Category, Product, ProductInfo
+from .search import tokenize
+
+
+def normalize(text):
+    """
+    Название в виде для сравнения: слова в нижнем регистре через пробел
+    """
+    return " ".join(tokenize(text))
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив названий для подсказок по префиксу
+
+    Каждое название попадает в массив с каждого своего слова, поэтому
+    «бел» находит и «Белый чехол», и «Смартфон белый». Поиск - двоичный
+    по массиву ключей, индекс целиком перестраивается в фоне при смене
+    версии каталога и подменяется одним присваиванием, не блокируя
+    читателей.
+    """
+
+    def __init__(self):
+        self._data = ([], [])
+        self._version = None
+        self._lock = threading.Lock()
+
+    def refresh(self, background=True):
+        """
+        Перестраивает индекс, если версия каталога изменилась.
+
+        Перестройка идет в фоновом потоке, а читатели до ее окончания
+        получают прежние массивы, поэтому запрос, заметивший новую
+        версию, не платит за чтение и сортировку всего каталога. Только
+        первый индекс процесса строится в запросе: отдавать еще нечего.
+
+        Args:
+        - background (bool): строить в фоновом потоке, если индекс уже есть.
+        """
+        version = get_catalog_version()
+        if version == self._version or not self._lock.acquire(blocking=False):
+            return
+        if background and self._version is not None:
+            threading.Thread(
+                target=self._build,
+                args=(version,),
+                kwargs={"close_connection": True},
+                name="autocomplete-index",
+                daemon=True,
+            ).start()
+        else:
+            self._build(version)
+
+    def _build(self, version, close_connection=False):
+        """
+        Строит индекс под уже взятой блокировкой и снимает ее
+        """
+        try:
+            products = Product.objects.filter(
+                id__in=ProductInfo.objects.values("product_id")
+            ).values_list("id", "name")
+            categories = Category.objects.filter(shop__isnull=False).distinct()
+            names = [("category", *row) for row in categories.values_list("id", "name")]
+            names += [("product", *row) for row in products.iterator()]
+
+            pairs = []
+            for entry in names:
+                words = normalize(entry[2]).split(" ")
+                for start in range(len(words)):
+                    pairs.append((" ".join(words[start:]), entry))
+            pairs.sort(key=lambda pair: pair[0])
+            self._data = (
+                [key for key, _ in pairs],
+                [entry for _, entry in pairs],
+            )
+            self._version = version
+        finally:
+            self._lock.release()
+            if close_connection:
+                # соединение фонового потока не закроет обработка запроса
+                connection.close()
+
+    def lookup(self, prefix, limit=10):
+        """
+        Подсказки, начинающиеся с префикса.
+
+        Args:
+        - prefix (str): введенный текст.
+        - limit (int): наибольшее число подсказок.
+
+        Returns:
+        - list: словари с полями type, id и name.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys, entries = self._data
+        results, seen = [], set()
+        index = bisect_left(keys, prefix)
+        while index < len(keys) and keys[index].startswith(prefix):
+            entry = entries[index]
+            if entry not in seen:
+                seen.add(entry)
+                results.append({"type": entry[0], "id": entry[1], "name": entry[2]})
+                if len(results) == limit:
+                    break
+            index += 1
+        return results
+
+
+_index = PrefixIndex()
+
+
+def suggest(prefix, limit=10):
+    """
+    Подсказки по названиям товаров и категорий текущего каталога.
+
+    Args:
+    - prefix (str): введенный текст.
+    - limit (int): наибольшее число подсказок.
+
+    Returns:
+    - list: словари с полями type, id и name.
+    """
+    _index.refresh()
+    return _index.lookup(prefix, limit)
@@ -0,0 +1,147 @@
+from functools import wraps
+from hashlib import blake2b
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from .models import Shop
+
+# Параметры запроса, расширяющие выборку за пределы одного магазина
+CROSS_SHOP_PARAMS = ("category_id",)
+
+
+def catalog_cache():
+    """
+    Бэкенд кэша каталога из настройки CATALOG_CACHE
+    """
+    return caches[settings.CATALOG_CACHE]
+
+
+def bump_catalog_version(shop_ids):
+    """
+    Увеличивает версию каталога магазинов, делая их кэш устаревшим.
+
+    Args:
+    - shop_ids (iterable): идентификаторы магазинов.
+    """
+    Shop.objects.filter(id__in=shop_ids).update(
+        catalog_version=F("catalog_version") + 1
+    )
+
+
+def get_catalog_version(shop_id=None):
+    """
+    Версия каталога одного магазина или всех магазинов сразу.
+
+    Версия всего каталога меняется при изменении версии любого магазина,
+    а также при добавлении или удалении магазина.
+
+    Args:
+    - shop_id (str): идентификатор магазина; None - весь каталог.
+
+    Returns:
+    - str: версия для ключа кэша, None если магазин не найден.
+    """
+    if shop_id is not None:
+        version = (
+            Shop.objects.filter(id=shop_id)
+            .values_list("catalog_version", flat=True)
+            .first()
+        )
+        return None if version is None else f"{shop_id}.{version}"
+
+    totals = Shop.objects.aggregate(shops=Count("id"), versions=Sum("catalog_version"))
+    return f"{totals['shops']}.{totals['versions'] or 0}"
+
+
+def catalog_key(request, version):
+    """
+    Ключ кэша ответа: версия каталога и параметры запроса
+    """
+    params = sorted(request.query_params.lists())
+    digest = blake2b(
+        repr((request.get_host(), request.path, params)).encode(), digest_size=16
+    )
+    return f"catalog:{version}:{digest.hexdigest()}"
+
+
+def catalog_etag(request, key):
+    """
+    Сильный ETag ответа: ключ кэша и формат вывода (JSON, API-браузер)
+    """
+    representation = f"{key}:{request.accepted_renderer.format}"
+    return quote_etag(blake2b(representation.encode(), digest_size=16).hexdigest())
+
+
+def cached_catalog(shop_param=None, cross_shop_params=CROSS_SHOP_PARAMS):
+    """
+    Кэширует ответы GET-метода представления каталога.
+
+    Ответ хранится под ключом из параметров запроса и версии каталога,
+    поэтому после импорта или смены статуса магазина старые записи
+    просто перестают находиться и вытесняются из кэша по LRU.
+    Из того же ключа строится ETag: клиент с совпадающим If-None-Match
+    получает 304 Not Modified без запросов к каталогу и сериализации.
+
+    Args:
+    - shop_param (str): параметр запроса с идентификатором магазина;
+      если выборка ограничена им, ключ зависит от версии одного магазина.
+    - cross_shop_params (tuple): параметры, с которыми выборка выходит
+      за пределы магазина из shop_param; с любым из них ключ зависит
+      от версии всего каталога.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            shop_id = _request_shop(request, shop_param, cross_shop_params)
+            version = shop_id and get_catalog_version(shop_id)
+            if version is None:
+                version = get_catalog_version()
+            key = catalog_key(request, version)
+            etag = catalog_etag(request, key)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified["ETag"] = etag
+                return not_modified
+
+            cache = catalog_cache()
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+            response["ETag"] = etag
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _request_shop(request, shop_param, cross_shop_params):
+    """
+    Магазин, которым ограничен запрос, или None для всего каталога.
+
+    Если в запросе есть параметр из cross_shop_params, shop_id
+    не учитывается: в списке товаров category_id объединяется
+    с shop_id через ИЛИ и выбирает товары других магазинов категории.
+    Представление, где фильтры только сужают выборку магазина,
+    передает пустой cross_shop_params.
+    """
+    if shop_param is None:
+        return None
+    params = request.query_params
+    shop_ids = params.getlist(shop_param)
+    if len(shop_ids) != 1 or not shop_ids[0].isdigit():
+        return None
+    if any(param in params for param in cross_shop_params):
+        return None
+    return shop_ids[0]
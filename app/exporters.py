@@ -0,0 +1,182 @@
+import csv
+from io import StringIO
+
+from django.conf import settings
+from ujson import dumps as dump_json
+from yaml import dump as dump_yaml
+
+from .importer import batched
+from .models import Category, Parameter, ProductParameter
+from .parsers import CSV_COLUMNS, HEADER_COLUMNS, csv_parameter_column
+
+try:
+    from yaml import CSafeDumper as StreamDumper
+except ImportError:
+    from yaml import SafeDumper as StreamDumper
+
+EXPORTERS = {}
+
+# Колонки ProductInfo для выгрузки: поле прайс-листа -> путь ORM
+GOODS_COLUMNS = {
+    "id": "external_id",
+    "category": "product__category_id",
+    "model": "model",
+    "name": "product__name",
+    "price": "price",
+    "price_rrc": "price_rrc",
+    "quantity": "quantity",
+}
+
+
+def register_exporter(name, content_type, extension):
+    """
+    Регистрирует выгрузку каталога в формате.
+
+    Выгрузка принимает выборку ProductInfo и магазин и возвращает
+    поток текстовых кусков ответа.
+
+    Args:
+    - name (str): название формата.
+    - content_type (str): MIME-тип ответа.
+    - extension (str): расширение файла.
+    """
+
+    def decorator(exporter):
+        EXPORTERS[name] = (exporter, content_type, extension)
+        return exporter
+
+    return decorator
+
+
+def iter_goods(queryset, chunk_size=None):
+    """
+    Потоково читает товары с параметрами в схеме прайс-листа.
+
+    Строки ProductInfo читаются курсором на сервере пачками, параметры
+    загружаются одним запросом на пачку, поэтому память не зависит
+    от размера каталога.
+
+    Args:
+    - queryset (QuerySet): выборка ProductInfo.
+    - chunk_size (int): число товаров в пачке.
+
+    Yields:
+    - list: пачка словарей товаров; кроме полей прайс-листа в словаре
+      есть shop, url и category_name.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = (
+        queryset.order_by("id")
+        .values_list(
+            "id",
+            "shop__name",
+            "shop__url",
+            "product__category__name",
+            *GOODS_COLUMNS.values(),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for batch in batched(rows, chunk_size):
+        parameters = {}
+        for product_info_id, name, value in (
+            ProductParameter.objects.filter(
+                product_info_id__in=[row[0] for row in batch]
+            )
+            .order_by("id")
+            .values_list("product_info_id", "parameter__name", "value")
+        ):
+            parameters.setdefault(product_info_id, {})[name] = value
+
+        yield [
+            {
+                "shop": shop,
+                "url": url,
+                "category_name": category_name,
+                **dict(zip(GOODS_COLUMNS, values)),
+                "parameters": parameters.get(product_info_id, {}),
+            }
+            for product_info_id, shop, url, category_name, *values in batch
+        ]
+
+
+@register_exporter("jsonl", "application/x-ndjson", ".jsonl")
+def export_json_lines(queryset, shop=None):
+    """
+    Выгрузка JSON Lines: один товар со всеми полями в строке
+    """
+    for goods in iter_goods(queryset):
+        yield "".join(
+            dump_json(item, ensure_ascii=False, escape_forward_slashes=False) + "\n"
+            for item in goods
+        )
+
+
+@register_exporter("csv", "text/csv", ".csv")
+def export_csv(queryset, shop=None):
+    """
+    Выгрузка CSV в формате разборщика iter_csv.
+
+    Колонки параметров - все параметры выгружаемых товаров, их список
+    читается одним запросом до первой строки. Параметр с именем
+    колонки товара выводится с префиксом, см. csv_parameter_column.
+    """
+    columns = {
+        name: csv_parameter_column(name)
+        for name in Parameter.objects.filter(
+            product_parameters__product_info__in=queryset
+        )
+        .distinct()
+        .order_by("name")
+        .values_list("name", flat=True)
+    }
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, [*HEADER_COLUMNS, *CSV_COLUMNS, *columns.values()])
+    writer.writeheader()
+    for goods in iter_goods(queryset):
+        for item in goods:
+            writer.writerow(
+                {key: value for key, value in item.items() if key != "parameters"}
+                | {columns[name]: value for name, value in item["parameters"].items()}
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@register_exporter("yaml", "application/yaml", ".yaml")
+def export_yaml(queryset, shop):
+    """
+    Выгрузка YAML прайс-листа магазина той же схемы, что и для импорта.
+
+    Шапка и категории выводятся до товаров, товары - по одному элементу
+    списка goods, поэтому выгрузку можно снова загрузить в PartnerUpdate.
+    """
+    categories = Category.objects.filter(
+        id__in=queryset.values("product__category_id")
+    ).order_by("id")
+    yield _dump_yaml(
+        {
+            "shop": shop.name,
+            **({"url": shop.url} if shop.url else {}),
+            "categories": list(categories.values("id", "name")),
+        }
+    )
+
+    started = False
+    for goods in iter_goods(queryset):
+        chunk = _dump_yaml(
+            [
+                {key: item[key] for key in (*GOODS_COLUMNS, "parameters")}
+                for item in goods
+            ]
+        )
+        yield chunk if started else "goods:\n" + chunk
+        started = True
+    if not started:
+        yield "goods: []\n"
+
+
+def _dump_yaml(data):
+    return dump_yaml(data, Dumper=StreamDumper, allow_unicode=True, sort_keys=False)
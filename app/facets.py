@@ -0,0 +1,105 @@
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db.models import Count
+
+from .cache import catalog_cache, get_catalog_version
+from .models import Parameter, ProductParameter
+
+PARAMETER_FILTER = "parameter"
+
+
+def parse_parameter_filters(params):
+    """
+    Разбирает фильтры по характеристикам из параметров запроса.
+
+    Каждый фильтр задается как parameter=<название>:<значение>. Значения
+    одного параметра объединяются через ИЛИ, разные параметры - через И:
+    ?parameter=Цвет:белый&parameter=Цвет:черный&parameter=Диагональ:6.5
+
+    Args:
+    - params (QueryDict): параметры запроса.
+
+    Returns:
+    - dict: название параметра -> список значений.
+
+    Raises:
+    - ValueError: фильтр не в формате название:значение.
+    """
+    filters = {}
+    for item in params.getlist(PARAMETER_FILTER):
+        name, separator, value = item.partition(":")
+        if not separator or not name.strip():
+            raise ValueError(f"Фильтр {item!r} должен иметь вид название:значение")
+        filters.setdefault(name.strip(), []).append(value.strip())
+    return filters
+
+
+def filter_by_parameters(queryset, filters):
+    """
+    Оставляет товары, подходящие под все фильтры по характеристикам.
+
+    Каждый фильтр - это выборка по индексу product_parameter_facet_idx,
+    поэтому ее стоимость зависит от числа подходящих товаров, а не от
+    размера таблицы характеристик.
+
+    Args:
+    - queryset (QuerySet): выборка ProductInfo.
+    - filters (dict): результат parse_parameter_filters.
+
+    Returns:
+    - QuerySet: отфильтрованная выборка.
+    """
+    parameters = {}
+    for parameter_id, name in Parameter.objects.filter(name__in=filters).values_list(
+        "id", "name"
+    ):
+        parameters.setdefault(name, []).append(parameter_id)
+
+    for name, values in filters.items():
+        if name not in parameters:
+            return queryset.none()
+        queryset = queryset.filter(
+            id__in=ProductParameter.objects.filter(
+                parameter_id__in=parameters[name], value__in=values
+            ).values("product_info_id")
+        )
+    return queryset
+
+
+def facet_counts(queryset):
+    """
+    Считает товары выборки для каждого значения каждой характеристики.
+
+    Результат кэшируется под версией всего каталога и текстом запроса
+    выборки: повторный подсчет для тех же фильтров, в том числе
+    из другого представления или с другой разбивкой на страницы,
+    стоит одного чтения версии, а импорт или смена статуса магазина
+    делает запись устаревшей.
+
+    Args:
+    - queryset (QuerySet): отфильтрованная выборка ProductInfo.
+
+    Returns:
+    - dict: название параметра -> список {"value", "count"}
+      по убыванию числа товаров.
+    """
+    sql, params = queryset.query.sql_with_params()
+    digest = blake2b(repr((sql, params)).encode(), digest_size=16)
+    key = f"facets:{get_catalog_version()}:{digest.hexdigest()}"
+    cache = catalog_cache()
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    rows = (
+        ProductParameter.objects.filter(product_info_id__in=queryset.values("id"))
+        .values_list("parameter__name", "value")
+        .annotate(count=Count("product_info_id"))
+        .order_by("parameter__name", "-count", "value")
+    )
+    facets = {}
+    for name, value, count in rows:
+        facets.setdefault(name, []).append({"value": value, "count": count})
+    cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+    return facets
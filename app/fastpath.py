@@ -0,0 +1,217 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
+from rest_framework import serializers
+
+from .shaping import Shape
+
+# Поля, у которых значение из базы уже совпадает с выводом to_representation
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+
+class FastPathUnsupported(Exception):
+    """
+    Сериализатор нельзя свести к выборке values()
+    """
+
+
+class RowMapper:
+    """
+    Предкомпилированное преобразование строк values() в вывод сериализатора
+
+    Дерево полей сериализатора разбирается один раз: каждому полю
+    сопоставляется колонка выборки и, если нужно, функция преобразования.
+    Связанные объекты «один ко многим» и «многие ко многим» загружаются
+    отдельным запросом на всю страницу, как prefetch_related, но без
+    создания моделей.
+
+    Attributes:
+    - columns (list): пути ORM для values().
+    """
+
+    def __init__(self, serializer, model):
+        self.columns = []
+        self._relations = []
+        self._steps = self._compile(serializer, model, "")
+
+    def values(self, queryset, *extra):
+        """
+        Выборка колонок для map.
+
+        Args:
+        - queryset (QuerySet): выборка модели сериализатора.
+        - extra (str): дополнительные колонки, например для пагинации.
+        """
+        return queryset.values(
+            *self.columns, *(column for column in extra if column not in self.columns)
+        )
+
+    def map(self, rows):
+        """
+        Строит вывод сериализатора по строкам values().
+
+        Args:
+        - rows (list): словари из values().
+
+        Returns:
+        - list: словари в формате сериализатора.
+        """
+        related = [relation.load(rows) for relation in self._relations]
+        return [self._build(self._steps, row, related) for row in rows]
+
+    def _column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return path
+
+    def _compile(self, serializer, model, prefix):
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                raise FastPathUnsupported(f"{name}: source {field.source!r}")
+            path = f"{prefix}{field.source}"
+
+            if isinstance(
+                field, (serializers.ListSerializer, serializers.ManyRelatedField)
+            ):
+                child = getattr(field, "child", None) or field.child_relation
+                key = self._column(f"{prefix}{model._meta.pk.name}")
+                steps.append((name, "many", key, len(self._relations)))
+                self._relations.append(ToMany(model, field.source, child, key))
+            elif isinstance(field, serializers.BaseSerializer):
+                related = _relation(model, field.source)
+                if related.many_to_many or related.one_to_many:
+                    raise FastPathUnsupported(f"{name}: связь ко многим без many=True")
+                related_model = related.related_model
+                key = self._column(f"{path}__{related_model._meta.pk.name}")
+                nested = self._compile(field, related_model, f"{path}__")
+                steps.append((name, "nested", key, nested))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = self._column(
+                    f"{prefix}{_relation(model, field.source).attname}"
+                )
+                steps.append((name, "value", column, None))
+            else:
+                convert = (
+                    None if isinstance(field, PLAIN_FIELDS) else field.to_representation
+                )
+                steps.append((name, "value", self._column(path), convert))
+        return steps
+
+    def _build(self, steps, row, related):
+        result = {}
+        for name, kind, column, extra in steps:
+            value = row[column]
+            if kind == "value":
+                result[name] = value if extra is None or value is None else extra(value)
+            elif kind == "nested":
+                result[name] = (
+                    None if value is None else self._build(extra, row, related)
+                )
+            else:
+                result[name] = related[extra].get(value, [])
+        return result
+
+
+class ToMany:
+    """
+    Связь ко многим в RowMapper: один запрос на страницу родителей
+
+    Attributes:
+    - key (str): колонка родителя с его идентификатором.
+    """
+
+    def __init__(self, model, source, child, key):
+        field = _relation(model, source)
+        if field.one_to_many:
+            # обратный ForeignKey, например Order.ordered_items
+            self.lookup = field.field.name
+        elif field.many_to_many and not field.auto_created:
+            # прямой ManyToManyField, например Category.shop
+            self.lookup = field.related_query_name()
+        else:
+            raise FastPathUnsupported(f"{source}: неподдерживаемая связь")
+        self.key = key
+        self.model = field.related_model
+        self.mapper = (
+            None
+            if isinstance(child, serializers.PrimaryKeyRelatedField)
+            else RowMapper(child, self.model)
+        )
+
+    def load(self, rows):
+        """
+        Связанные объекты по идентификатору родителя.
+
+        Args:
+        - rows (list): строки родителей.
+
+        Returns:
+        - dict: идентификатор родителя -> список вывода.
+        """
+        ids = {row[self.key] for row in rows} - {None}
+        if not ids:
+            return {}
+        queryset = self.model._default_manager.filter(
+            **{f"{self.lookup}__in": ids}
+        ).order_by("pk")
+        parent = F(self.lookup)
+
+        grouped = {}
+        if self.mapper is None:
+            for pk, parent_id in queryset.values_list("pk", parent):
+                grouped.setdefault(parent_id, []).append(pk)
+            return grouped
+
+        children = list(queryset.values(*self.mapper.columns, _parent=parent))
+        for child, output in zip(children, self.mapper.map(children)):
+            grouped.setdefault(child["_parent"], []).append(output)
+        return grouped
+
+
+@lru_cache(maxsize=64)
+def _compiled(serializer_class, fields, expand):
+    serializer = serializer_class(
+        shape=Shape(
+            None if fields is None else set(fields),
+            None if expand is None else set(expand),
+        )
+    )
+    return RowMapper(serializer, serializer.Meta.model)
+
+
+def row_mapper(serializer_class, shape=None):
+    """
+    RowMapper для сериализатора и формы ответа, скомпилированный один раз.
+
+    Args:
+    - serializer_class (type): сериализатор с ShapedSerializerMixin.
+    - shape (Shape): форма ответа из параметров fields и expand.
+
+    Returns:
+    - RowMapper: преобразователь строк.
+
+    Raises:
+    - FastPathUnsupported: сериализатор не сводится к values().
+    """
+    shape = shape or Shape()
+    return _compiled(
+        serializer_class,
+        None if shape.fields is None else frozenset(shape.fields),
+        None if shape.expand is None else frozenset(shape.expand),
+    )
+
+
+def _relation(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist as error:
+        raise FastPathUnsupported(str(error)) from error
@@ -0,0 +1,105 @@
+import time
+from contextlib import contextmanager
+from tempfile import TemporaryFile
+
+from django.conf import settings
+from requests import RequestException, get
+
+
+class FetchError(Exception):
+    """
+    Ошибка загрузки прайс-листа поставщика
+    """
+
+
+class Download:
+    """
+    Результат загрузки прайс-листа
+
+    Attributes:
+    - file (file-like): временный файл с телом ответа, None если не изменился
+    - etag (str): заголовок ETag ответа
+    - last_modified (str): заголовок Last-Modified ответа
+    - content_type (str): заголовок Content-Type ответа
+    - not_modified (bool): сервер ответил 304 Not Modified
+    """
+
+    def __init__(
+        self,
+        file=None,
+        etag="",
+        last_modified="",
+        content_type="",
+        not_modified=False,
+    ):
+        self.file = file
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.not_modified = not_modified
+
+
+@contextmanager
+def fetch_price_list(url, etag="", last_modified=""):
+    """
+    Скачивает прайс-лист во временный файл с ограничениями.
+
+    Соединение и чтение ограничены таймаутами, вся загрузка -
+    IMPORT_FETCH_DEADLINE секундами, размер тела - IMPORT_MAX_SIZE байтами.
+    Если переданы etag или last_modified, запрос условный и неизменившийся
+    прайс-лист не скачивается.
+
+    Args:
+    - url (str): ссылка на прайс-лист.
+    - etag (str): ETag прошлой загрузки.
+    - last_modified (str): Last-Modified прошлой загрузки.
+
+    Yields:
+    - Download: результат загрузки; файл удаляется при выходе из блока.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    deadline = time.monotonic() + settings.IMPORT_FETCH_DEADLINE
+    try:
+        response = get(
+            url,
+            headers=headers,
+            stream=True,
+            timeout=(settings.IMPORT_CONNECT_TIMEOUT, settings.IMPORT_READ_TIMEOUT),
+        )
+    except RequestException as error:
+        raise FetchError(str(error)) from error
+
+    with response, TemporaryFile() as file:
+        if response.status_code == 304:
+            yield Download(etag=etag, last_modified=last_modified, not_modified=True)
+            return
+        if response.status_code != 200:
+            raise FetchError(f"Сервер поставщика ответил {response.status_code}")
+
+        if int(response.headers.get("Content-Length") or 0) > settings.IMPORT_MAX_SIZE:
+            raise FetchError("Прайс-лист превышает допустимый размер")
+
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > settings.IMPORT_MAX_SIZE:
+                    raise FetchError("Прайс-лист превышает допустимый размер")
+                if time.monotonic() > deadline:
+                    raise FetchError("Превышено время загрузки прайс-листа")
+                file.write(chunk)
+        except RequestException as error:
+            raise FetchError(str(error)) from error
+        file.seek(0)
+
+        yield Download(
+            file,
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", ""),
+            content_type=response.headers.get("Content-Type", ""),
+        )
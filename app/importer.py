@@ -0,0 +1,623 @@
+from datetime import timedelta
+from hashlib import blake2b
+from itertools import islice
+from json import dumps
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import (
+    Category,
+    ImportJob,
+    OrderItem,
+    Parameter,
+    Product,
+    ProductInfo,
+    ProductInfoStage,
+    ProductParameter,
+    Shop,
+)
+from .parsers import iter_records
+from .readmodel import refresh_best_offers, refresh_catalog_entries
+from .search import search_document
+
+PRODUCT_INFO_FIELDS = (
+    "product",
+    "model",
+    "price",
+    "price_rrc",
+    "quantity",
+    "fingerprint",
+    "search_document",
+)
+# Наибольшая пачка товаров, как бы ни была задана IMPORT_BATCH_SIZE
+MAX_BATCH_SIZE = 5000
+# Обязательные поля товара прайс-листа: целые неотрицательные числа
+INTEGER_FIELDS = ("id", "price", "price_rrc", "quantity")
+
+
+class ImportRejected(Exception):
+    """
+    Прайс-лист нельзя загрузить от имени этого пользователя
+    """
+
+
+def batched(iterable, size):
+    """
+    Разбивает поток товаров на пачки фиксированного размера
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class CatalogImporter:
+    """
+    Импорт прайс-листа поставщика пачками
+
+    Категории, продукты и параметры ищутся по словарям в памяти,
+    а ProductInfo и ProductParameter пишутся через bulk_create/bulk_update
+    по ключу (shop, external_id), поэтому число запросов на пачку
+    не зависит от её размера. Товары, хеш содержимого которых
+    не изменился с прошлого импорта, не перезаписываются.
+
+    Измененные товары сначала копятся во временной таблице
+    ProductInfoStage и попадают в живой каталог одной транзакцией
+    в publish.
+
+    Attributes:
+    - shop (Shop): магазин, в который идет импорт
+    - batch_size (int): число товаров в одной пачке, не больше MAX_BATCH_SIZE
+    - parsed (int): сколько товаров прочитано
+    - staged (int): сколько измененных товаров ждет публикации
+    - written (int): сколько строк ProductInfo записано
+    - created, updated, unchanged, deleted (int): итоги сравнения
+      с прошлым импортом
+    - errors (list): ошибки по отдельным товарам
+    - progress (callable): вызывается с импортером после каждой пачки
+    - on_publish (callable): вызывается с импортером в транзакции публикации
+    """
+
+    def __init__(self, shop, batch_size=None, progress=None, on_publish=None):
+        self.shop = shop
+        self.token = uuid4()
+        # пачка ограничена сверху: один запрос публикации не держит
+        # блокировки на слишком большом числе строк
+        self.batch_size = min(batch_size or settings.IMPORT_BATCH_SIZE, MAX_BATCH_SIZE)
+        self.progress = progress
+        self.on_publish = on_publish
+        self.parsed = 0
+        self.staged = 0
+        self.written = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.errors = []
+        self._seen = set()
+        self._categories = {}
+        self._parameters = {}
+        self._offers = set()
+
+    @classmethod
+    def for_shop(cls, name, url="", user=None, **kwargs):
+        """
+        Импортер в магазин из шапки прайс-листа.
+
+        Прайс-лист пользователя попадает только в его магазин: магазин
+        создается и привязывается к пользователю при первом импорте,
+        а прайс-лист с названием чужого магазина отклоняется. Без
+        пользователя (импорт командой manage.py) магазин ищется
+        по названию и ссылке.
+
+        Args:
+        - name (str): название магазина из прайс-листа.
+        - url (str): ссылка магазина из прайс-листа.
+        - user (User): владелец прайс-листа.
+
+        Raises:
+        - ImportRejected: прайс-лист называет чужой магазин.
+        """
+        if user is None:
+            shop, _ = Shop.objects.get_or_create(name=name, url=url)
+            return cls(shop, **kwargs)
+
+        shop = Shop.objects.filter(user=user).first()
+        if shop is None:
+            if Shop.objects.filter(name=name).exists():
+                raise ImportRejected(
+                    f"Магазин «{name}» принадлежит другому пользователю"
+                )
+            shop, _ = Shop.objects.get_or_create(
+                user=user, defaults={"name": name, "url": url}
+            )
+        if shop.name != name:
+            raise ImportRejected(
+                f"Прайс-лист магазина «{name}», а пользователю принадлежит «{shop.name}»"
+            )
+        return cls(shop, **kwargs)
+
+    def import_categories(self, categories):
+        """
+        Создает недостающие категории; к магазину они привязываются
+        при публикации каталога.
+
+        Args:
+        - categories (list): список словарей с ключами id и name.
+        """
+        names = {category["id"]: category["name"] for category in categories}
+        existing = _get_or_create_by_name(Category, set(names.values()))
+        for external_id, name in names.items():
+            self._categories[external_id] = existing[name]
+
+    def import_goods(self, goods):
+        """
+        Разбирает товары пачками по batch_size во временную таблицу.
+
+        Живой каталог магазина не меняется до publish. Общие для всех
+        магазинов продукты и параметры создаются сразу: уникальность
+        их ключей держит база, поэтому параллельные импорты не
+        создают дубликатов.
+
+        Args:
+        - goods (Iterable[dict]): товары в формате прайс-листа.
+        """
+        for batch in batched(goods, self.batch_size):
+            changed = self._diff_batch(batch)
+            if changed:
+                products = self._resolve_products(item for _, item in changed.values())
+                parameters = self._resolve_parameters(
+                    item for _, item in changed.values()
+                )
+                self._stage_batch(changed, products, parameters)
+            if self.progress:
+                self.progress(self)
+
+    def _diff_batch(self, batch):
+        """
+        Отбирает товары пачки, хеш которых изменился.
+
+        Товары без обязательных полей и повторы id не прерывают
+        импорт: они пропускаются и попадают в errors.
+
+        Returns:
+        - dict: измененные товары в виде external_id -> (fingerprint, item).
+        """
+        items = {}
+        for item in batch:
+            self.parsed += 1
+            error = _item_error(item)
+            if error is None and item["id"] in self._seen:
+                error = "Товар с таким id уже есть в прайс-листе"
+            elif error is None and item.get("category") not in self._categories:
+                error = "Неизвестная категория"
+            if isinstance(item.get("id"), int):
+                # товар с ошибкой не удаляется из каталога как пропавший
+                self._seen.add(item["id"])
+            if error is not None:
+                self.errors.append({"id": item.get("id"), "Error": error})
+                continue
+            items[item["id"]] = item
+
+        existing = dict(
+            ProductInfo.objects.filter(
+                shop=self.shop, external_id__in=items.keys()
+            ).values_list("external_id", "fingerprint")
+        )
+        changed = {}
+        for external_id, item in items.items():
+            fingerprint = self._fingerprint(item)
+            if fingerprint == existing.get(external_id):
+                self.unchanged += 1
+            else:
+                changed[external_id] = (fingerprint, item)
+        return changed
+
+    def _stage_batch(self, changed, products, parameters):
+        staged = []
+        for external_id, (fingerprint, item) in changed.items():
+            category = self._categories[item["category"]]
+            staged.append(
+                ProductInfoStage(
+                    token=self.token,
+                    shop=self.shop,
+                    external_id=external_id,
+                    product=products[(item.get("name"), category.id)],
+                    model=item.get("model") or "",
+                    price=item.get("price"),
+                    price_rrc=item.get("price_rrc"),
+                    quantity=item.get("quantity"),
+                    fingerprint=fingerprint,
+                    parameters={
+                        parameters[name].id: str(value)
+                        for name, value in (item.get("parameters") or {}).items()
+                    },
+                )
+            )
+        ProductInfoStage.objects.bulk_create(staged)
+        self.staged += len(staged)
+
+    def publish(self):
+        """
+        Переключает каталог магазина на загруженный прайс-лист.
+
+        Изменения из временной таблицы, удаление пропавших товаров
+        и привязка категорий выполняются одной транзакцией, поэтому
+        читатели видят либо старый каталог, либо новый целиком.
+        Если каталог изменился, его версия увеличивается и кэш
+        ответов магазина устаревает; новая привязка категории меняет
+        и версии других магазинов этой категории.
+
+        Строка магазина блокируется до конца транзакции, поэтому
+        импорты одного магазина публикуются по очереди. Из временной
+        таблицы удаляются строки этого импорта и строки прерванных
+        импортов любых магазинов старше IMPORT_STAGE_TTL; строки
+        идущего параллельно импорта остаются ему.
+
+        ETag и Last-Modified прошлых задач импорта владельца магазина
+        сбрасываются: они описывают прайс-лист, который больше
+        не опубликован. Условия для следующей загрузки по ссылке
+        сохраняет on_publish в той же транзакции.
+
+        Транзакция не короткая: в ней пишутся все измененные товары
+        прайс-листа (пачками по batch_size), их параметры и строки
+        CatalogEntry и удаляются пропавшие товары. Ее длина растет
+        с числом изменений, а не с размером прайс-листа: неизменные
+        товары отсеиваются по хешу еще при разборе. Общие для магазинов
+        строки Product в ней не блокируются - лучшие предложения
+        пересчитываются после фиксации, и до пересчета BestOffer может
+        ненадолго показывать прежние цены.
+        """
+        staged = (
+            ProductInfoStage.objects.filter(token=self.token)
+            .select_related("product__category")
+            .order_by("id")
+        )
+        with transaction.atomic():
+            Shop.objects.select_for_update().get(id=self.shop.id)
+            linked = set(
+                Category.shop.through.objects.filter(shop=self.shop).values_list(
+                    "category_id", flat=True
+                )
+            )
+            links = Category.shop.through.objects.bulk_create(
+                [
+                    Category.shop.through(category_id=category.id, shop_id=self.shop.id)
+                    for category in set(self._categories.values())
+                    if category.id not in linked
+                ],
+                ignore_conflicts=True,
+            )
+            last_id = 0
+            while batch := list(staged.filter(id__gt=last_id)[: self.batch_size]):
+                self._apply_batch(batch)
+                last_id = batch[-1].id
+            self.remove_missing()
+            ProductInfoStage.objects.filter(token=self.token).delete()
+            changed = set()
+            if links or self.created or self.updated or self.deleted:
+                changed.add(self.shop.id)
+            if links:
+                # список магазинов категории выводится в товарах всех
+                # ее магазинов, их кэш тоже устаревает
+                changed.update(
+                    Category.shop.through.objects.filter(
+                        category_id__in={link.category_id for link in links}
+                    ).values_list("shop_id", flat=True)
+                )
+            if changed:
+                bump_catalog_version(changed)
+            if self.shop.user_id:
+                ImportJob.objects.filter(user_id=self.shop.user_id).exclude(
+                    etag="", last_modified=""
+                ).update(etag="", last_modified="")
+            if self.on_publish:
+                self.on_publish(self)
+
+        # общие для магазинов строки Product блокируются уже после
+        # фиксации каталога, короткими транзакциями на пачку по
+        # возрастанию id, и публикации разных магазинов не ждут
+        # друг друга по кругу
+        for batch in batched(sorted(self._offers), self.batch_size):
+            refresh_best_offers(batch)
+        if self._offers:
+            # ответы, собранные до пересчета, не остаются в кэше
+            bump_catalog_version([self.shop.id])
+        purge_stale_stage()
+
+    def discard(self):
+        """
+        Удаляет строки неудавшегося импорта из временной таблицы
+        """
+        ProductInfoStage.objects.filter(token=self.token).delete()
+
+    def _apply_batch(self, batch):
+        existing, products = {}, {row.product_id for row in batch}
+        for external_id, pk, product_id in ProductInfo.objects.filter(
+            shop=self.shop, external_id__in=[row.external_id for row in batch]
+        ).values_list("external_id", "id", "product_id"):
+            existing[external_id] = pk
+            # товар мог перейти к другому продукту - пересчитывается и прежний
+            products.add(product_id)
+        to_create, to_update, wanted = [], [], {}
+        for row in batch:
+            product_info = ProductInfo(
+                id=existing.get(row.external_id),
+                shop=self.shop,
+                external_id=row.external_id,
+                product_id=row.product_id,
+                model=row.model,
+                price=row.price,
+                price_rrc=row.price_rrc,
+                quantity=row.quantity,
+                fingerprint=row.fingerprint,
+                search_document=search_document(
+                    row.product.name,
+                    row.model,
+                    row.product.category.name,
+                    row.parameters.values(),
+                ),
+            )
+            if product_info.id:
+                to_update.append(product_info)
+            else:
+                to_create.append(product_info)
+        ProductInfo.objects.bulk_create(to_create)
+        ProductInfo.objects.bulk_update(to_update, PRODUCT_INFO_FIELDS)
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        self.written += len(to_create) + len(to_update)
+
+        product_infos = {
+            product_info.external_id: product_info.id
+            for product_info in to_create + to_update
+        }
+        for row in batch:
+            for parameter_id, value in row.parameters.items():
+                wanted[(product_infos[row.external_id], int(parameter_id))] = value
+        self._write_parameters(to_update, wanted)
+        refresh_catalog_entries(list(product_infos.values()))
+        self._offers.update(products)
+
+    def _write_parameters(self, to_update, wanted):
+        """
+        Пишет только отличающиеся строки ProductParameter.
+
+        Args:
+        - to_update (list): обновляемые ProductInfo, у которых уже есть параметры.
+        - wanted (dict): значения по ключу (product_info_id, parameter_id).
+        """
+        stale, changed = [], []
+        for product_parameter in ProductParameter.objects.filter(
+            product_info__in=to_update
+        ):
+            key = (product_parameter.product_info_id, product_parameter.parameter_id)
+            value = wanted.pop(key, None)
+            if value is None:
+                stale.append(product_parameter.id)
+            elif value != product_parameter.value:
+                product_parameter.value = value
+                changed.append(product_parameter)
+
+        if stale:
+            ProductParameter.objects.filter(id__in=stale).delete()
+        ProductParameter.objects.bulk_update(changed, ["value"])
+        ProductParameter.objects.bulk_create(
+            [
+                ProductParameter(
+                    product_info_id=product_info_id,
+                    parameter_id=parameter_id,
+                    value=value,
+                )
+                for (product_info_id, parameter_id), value in wanted.items()
+            ]
+        )
+
+    def remove_missing(self):
+        """
+        Убирает товары магазина, которых нет в прайс-листе.
+
+        Товары, уже попавшие в заказы, не удаляются, а снимаются
+        с продажи (quantity = 0), чтобы не потерять позиции заказов.
+        """
+        missing = {
+            pk: product_id
+            for pk, external_id, product_id in ProductInfo.objects.filter(
+                shop=self.shop
+            ).values_list("id", "external_id", "product_id")
+            if external_id not in self._seen
+        }
+        for batch in batched(missing, self.batch_size):
+            with transaction.atomic():
+                ordered = set(
+                    OrderItem.objects.filter(product_info_id__in=batch).values_list(
+                        "product_info_id", flat=True
+                    )
+                )
+                ProductInfo.objects.filter(id__in=ordered).exclude(quantity=0).update(
+                    quantity=0, fingerprint=""
+                )
+                ProductInfo.objects.filter(id__in=set(batch) - ordered).delete()
+                self.deleted += len(batch) - len(ordered)
+                refresh_catalog_entries(list(ordered))
+            self._offers.update(missing[pk] for pk in batch)
+
+    def _fingerprint(self, item):
+        """
+        Хеш содержимого товара для сравнения с прошлым импортом
+        """
+        content = [
+            item.get("name"),
+            self._categories[item["category"]].id,
+            item.get("model") or "",
+            item.get("price"),
+            item.get("price_rrc"),
+            item.get("quantity"),
+            sorted(
+                (name, str(value))
+                for name, value in (item.get("parameters") or {}).items()
+            ),
+        ]
+        return blake2b(
+            dumps(content, ensure_ascii=False).encode(), digest_size=16
+        ).hexdigest()
+
+    def _resolve_products(self, items):
+        keys = {
+            (item.get("name"), self._categories[item["category"]].id) for item in items
+        }
+        if not keys:
+            return {}
+        queryset = Product.objects.filter(
+            name__in={name for name, _ in keys},
+            category_id__in={category_id for _, category_id in keys},
+        )
+        products = {
+            (product.name, product.category_id): product for product in queryset
+        }
+        missing = keys - products.keys()
+        if missing:
+            # продукт мог создать параллельный импорт: конфликт по
+            # unique_product пропускается, строки читаются заново
+            Product.objects.bulk_create(
+                [
+                    Product(name=name, category_id=category_id)
+                    for name, category_id in missing
+                ],
+                ignore_conflicts=True,
+            )
+            products.update(
+                ((product.name, product.category_id), product)
+                for product in queryset.all()
+            )
+        return products
+
+    def _resolve_parameters(self, items):
+        names = {
+            name
+            for item in items
+            for name in (item.get("parameters") or {})
+            if name not in self._parameters
+        }
+        if names:
+            self._parameters.update(_get_or_create_by_name(Parameter, names))
+        return self._parameters
+
+
+def _get_or_create_by_name(model, names):
+    """
+    Строки модели с уникальным name, недостающие создаются.
+
+    Строку с тем же названием мог только что создать параллельный
+    импорт: конфликт по уникальному ключу пропускается, и недостающие
+    строки читаются заново.
+
+    Args:
+    - model (type): Category или Parameter.
+    - names (set): названия.
+
+    Returns:
+    - dict: название -> строка модели.
+    """
+    existing = {row.name: row for row in model.objects.filter(name__in=names)}
+    missing = names - existing.keys()
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name) for name in missing], ignore_conflicts=True
+        )
+        existing.update(
+            (row.name, row) for row in model.objects.filter(name__in=missing)
+        )
+    return existing
+
+
+def _item_error(item):
+    """
+    Ошибка в обязательных полях товара прайс-листа или None
+    """
+    for field in INTEGER_FIELDS:
+        value = item.get(field)
+        if value is None:
+            return f"Не указано поле {field}"
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            return f"Поле {field} должно быть целым неотрицательным числом"
+    name = item.get("name")
+    if not isinstance(name, str) or not name.strip():
+        return "Не указано поле name"
+    return None
+
+
+def purge_stale_stage():
+    """
+    Удаляет из временной таблицы строки импортов, прерванных
+    раньше IMPORT_STAGE_TTL секунд назад.
+
+    Returns:
+    - int: число удаленных строк.
+    """
+    expired = timezone.now() - timedelta(seconds=settings.IMPORT_STAGE_TTL)
+    return ProductInfoStage.objects.filter(created_at__lt=expired).delete()[0]
+
+
+def import_records(records, **kwargs):
+    """
+    Импортирует прайс-лист из потока записей.
+
+    Шапка (shop, url) должна идти раньше товаров, как в прайс-листах
+    поставщиков; категории могут встречаться и между товарами.
+    Товары разбираются пачками по мере чтения, а каталог магазина
+    переключается на новый прайс-лист после чтения всего потока.
+
+    Args:
+    - records (Iterable[tuple]): пары (ключ, значение), см. iter_price_list.
+
+    Returns:
+    - CatalogImporter: импортер со статистикой импорта.
+    """
+    records = iter(records)
+    header, categories, goods = {}, [], []
+    for key, value in records:
+        if key == "goods":
+            goods.append(value)
+            break
+        if key == "categories":
+            categories.append(value)
+        else:
+            header[key] = value
+
+    importer = CatalogImporter.for_shop(
+        header.get("shop"), header.get("url", ""), **kwargs
+    )
+    importer.import_categories(categories)
+
+    def iter_goods():
+        yield from goods
+        for key, value in records:
+            if key == "goods":
+                yield value
+            elif key == "categories":
+                importer.import_categories([value])
+
+    try:
+        importer.import_goods(iter_goods())
+        importer.publish()
+    except Exception:
+        importer.discard()
+        raise
+    return importer
+
+
+def import_price_list(data, **kwargs):
+    """
+    Импортирует разобранный прайс-лист целиком.
+
+    Args:
+    - data (dict): прайс-лист с ключами shop, url, categories, goods.
+
+    Returns:
+    - CatalogImporter: импортер со статистикой импорта.
+    """
+    return import_records(iter_records(data), **kwargs)
@@ -0,0 +1,86 @@
+import resource
+import time
+import tracemalloc
+from io import TextIOWrapper
+from tempfile import TemporaryFile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app.importer import import_records
+from app.parsers import iter_price_list
+
+from .generate_price_list import (
+    add_generator_arguments,
+    generator_options,
+    write_price_list,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет скорость импорта синтетического прайс-листа: "
+        "товаров в секунду, число запросов и пиковую память"
+    )
+
+    def add_arguments(self, parser):
+        add_generator_arguments(parser)
+        parser.add_argument(
+            "--batch-size", type=int, help="Размер пачки, по умолчанию из настроек"
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=2,
+            help="Число импортов подряд; повторные замеряют импорт без изменений",
+        )
+        parser.add_argument(
+            "--tracemalloc",
+            action="store_true",
+            help="Считать пиковую память Python через tracemalloc (медленнее)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Не откатывать импортированные данные",
+        )
+
+    def handle(self, *args, **options):
+        with TemporaryFile() as file:
+            text = TextIOWrapper(file, encoding="utf-8", newline="")
+            write_price_list(text, **generator_options(options))
+            text.detach()
+            self.stdout.write(
+                f"Прайс-лист: {options['skus']} товаров, "
+                f"{file.tell() / 2**20:.1f} МиБ ({options['format']})"
+            )
+
+            with transaction.atomic():
+                for run in range(options["runs"]):
+                    file.seek(0)
+                    self._measure(run, file, options)
+                transaction.set_rollback(not options["keep"])
+
+    def _measure(self, run, file, options):
+        records = iter_price_list(file, filename=f"bench.{options['format']}")
+        if options["tracemalloc"]:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            importer = import_records(records, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        if options["tracemalloc"]:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            # ru_maxrss в Linux - килобайты, пик за все время процесса
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        self.stdout.write(
+            f"Импорт {run + 1}: {importer.parsed} товаров за {elapsed:.2f} с "
+            f"({importer.parsed / elapsed:.0f} товаров/с), "
+            f"запросов {len(queries)}, пиковая память {peak / 2**20:.1f} МиБ; "
+            f"создано {importer.created}, обновлено {importer.updated}, "
+            f"без изменений {importer.unchanged}, удалено {importer.deleted}"
+        )
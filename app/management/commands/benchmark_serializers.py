@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app.fastpath import row_mapper
+from app.importer import import_price_list
+from app.models import ProductInfo
+from app.serializers import ProductInfoSerializer
+
+from .generate_price_list import generate_goods
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает ProductInfoSerializer и предкомпилированный RowMapper "
+        "на синтетическом каталоге: строк в секунду и число запросов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--skus", type=int, default=10000, help="Число товаров")
+        parser.add_argument(
+            "--runs", type=int, default=3, help="Число замеров, берется лучший"
+        )
+
+    def handle(self, *args, **options):
+        price_list = {
+            "shop": "Тестовый магазин",
+            "categories": [
+                {"id": index, "name": f"Категория {index}"} for index in range(1, 21)
+            ],
+            "goods": generate_goods(
+                skus=options["skus"],
+                categories=20,
+                parameters=10,
+                values=50,
+                per_item=5,
+            ),
+        }
+
+        with transaction.atomic():
+            importer = import_price_list(price_list)
+            queryset = ProductInfo.objects.filter(shop=importer.shop).order_by("id")
+            serializer = self._measure(
+                "ProductInfoSerializer",
+                options["runs"],
+                lambda: ProductInfoSerializer(
+                    queryset.select_related(
+                        "shop", "product__category"
+                    ).prefetch_related("product__category__shop"),
+                    many=True,
+                ).data,
+            )
+            mapper = row_mapper(ProductInfoSerializer)
+            fast = self._measure(
+                "RowMapper",
+                options["runs"],
+                lambda: mapper.map(list(mapper.values(queryset))),
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Ускорение {serializer[0] / fast[0]:.1f}x, "
+            f"вывод {'совпадает' if serializer[1] == fast[1] else 'ОТЛИЧАЕТСЯ'}"
+        )
+
+    def _measure(self, name, runs, serialize):
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                data = serialize()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write(
+            f"{name}: {len(data)} строк за {best:.3f} с "
+            f"({len(data) / best:.0f} строк/с), запросов {len(queries)}"
+        )
+        return best, data
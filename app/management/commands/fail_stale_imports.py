@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.tasks import fail_stale_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Отмечает неудавшимися задачи импорта в очереди или в работе, "
+        "которые дольше IMPORT_JOB_TIMEOUT не сообщали о прогрессе"
+    )
+
+    def handle(self, *args, **options):
+        count = fail_stale_jobs()
+        self.stdout.write(f"Прерванных задач импорта: {count}")
@@ -0,0 +1,158 @@
+import csv
+import random
+import sys
+
+from django.core.management.base import BaseCommand
+from ujson import dumps
+
+
+def generate_goods(skus, categories, parameters, values, per_item, seed=0):
+    """
+    Генерирует товары синтетического прайс-листа.
+
+    Args:
+    - skus (int): число товаров.
+    - categories (int): число категорий.
+    - parameters (int): число разных параметров.
+    - values (int): число разных значений каждого параметра.
+    - per_item (int): число параметров у одного товара.
+    - seed (int): зерно генератора случайных чисел.
+
+    Yields:
+    - dict: товар в формате прайс-листа.
+    """
+    rnd = random.Random(seed)
+    names = [f"Параметр {index}" for index in range(parameters)]
+    per_item = min(per_item, parameters)
+    for index in range(skus):
+        price = rnd.randint(100, 200000)
+        yield {
+            "id": index + 1,
+            "category": index % categories + 1,
+            "model": f"model/{index}",
+            "name": f"Товар {index}",
+            "price": price,
+            "price_rrc": price + price // 10,
+            "quantity": rnd.randint(0, 100),
+            "parameters": {
+                name: f"Значение {rnd.randrange(values)}"
+                for name in rnd.sample(names, per_item)
+            },
+        }
+
+
+def write_price_list(out, format="yaml", shop="Тестовый магазин", **options):
+    """
+    Пишет синтетический прайс-лист в файл, не собирая его в памяти.
+
+    Args:
+    - out (file-like): текстовый файл для записи.
+    - format (str): yaml, json или csv.
+    - shop (str): название магазина.
+    - options: параметры generate_goods.
+    """
+    goods = generate_goods(**options)
+    categories = [
+        {"id": index + 1, "name": f"Категория {index + 1}"}
+        for index in range(options["categories"])
+    ]
+
+    if format == "csv":
+        names = [f"Параметр {index}" for index in range(options["parameters"])]
+        writer = csv.writer(out)
+        writer.writerow(
+            ["shop", "category", "category_name", "id", "name", "model"]
+            + ["price", "price_rrc", "quantity"]
+            + names
+        )
+        for item in goods:
+            writer.writerow(
+                [shop, item["category"], f"Категория {item['category']}"]
+                + [item["id"], item["name"], item["model"], item["price"]]
+                + [item["price_rrc"], item["quantity"]]
+                + [item["parameters"].get(name, "") for name in names]
+            )
+        return
+
+    if format == "json":
+        out.write(f'{{"shop": {dumps(shop, ensure_ascii=False)}, ')
+        out.write(f'"categories": {dumps(categories, ensure_ascii=False)}, ')
+        out.write('"goods": [')
+        for index, item in enumerate(goods):
+            out.write(("," if index else "") + dumps(item, ensure_ascii=False))
+        out.write("]}\n")
+        return
+
+    # JSON-строки являются корректными скалярами YAML
+    out.write(f"shop: {dumps(shop, ensure_ascii=False)}\ncategories:\n")
+    for category in categories:
+        out.write(f"  - id: {category['id']}\n")
+        out.write(f"    name: {dumps(category['name'], ensure_ascii=False)}\n")
+    out.write("goods:\n")
+    for item in goods:
+        out.write(f"  - id: {item['id']}\n")
+        out.write(f"    category: {item['category']}\n")
+        out.write(f"    model: {dumps(item['model'])}\n")
+        out.write(f"    name: {dumps(item['name'], ensure_ascii=False)}\n")
+        out.write(f"    price: {item['price']}\n")
+        out.write(f"    price_rrc: {item['price_rrc']}\n")
+        out.write(f"    quantity: {item['quantity']}\n")
+        out.write("    parameters:\n" if item["parameters"] else "")
+        for name, value in item["parameters"].items():
+            out.write(
+                f"      {dumps(name, ensure_ascii=False)}: "
+                f"{dumps(value, ensure_ascii=False)}\n"
+            )
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--skus", type=int, default=10000, help="Число товаров")
+    parser.add_argument("--categories", type=int, default=20, help="Число категорий")
+    parser.add_argument(
+        "--parameters", type=int, default=10, help="Число разных параметров"
+    )
+    parser.add_argument(
+        "--values", type=int, default=50, help="Число значений у параметра"
+    )
+    parser.add_argument(
+        "--per-item", type=int, default=5, help="Число параметров у товара"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shop", default="Тестовый магазин", help="Название магазина")
+    parser.add_argument(
+        "--format", choices=("yaml", "json", "csv"), default="yaml", help="Формат"
+    )
+
+
+def generator_options(options):
+    """
+    Выбирает из опций команды параметры write_price_list
+    """
+    keys = (
+        "format",
+        "shop",
+        "skus",
+        "categories",
+        "parameters",
+        "values",
+        "per_item",
+        "seed",
+    )
+    return {key: options[key] for key in keys}
+
+
+class Command(BaseCommand):
+    help = "Генерирует синтетический прайс-лист поставщика"
+
+    def add_arguments(self, parser):
+        add_generator_arguments(parser)
+        parser.add_argument(
+            "-o", "--output", help="Файл для записи, по умолчанию stdout"
+        )
+
+    def handle(self, *args, **options):
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as out:
+                write_price_list(out, **generator_options(options))
+        else:
+            write_price_list(sys.stdout, **generator_options(options))
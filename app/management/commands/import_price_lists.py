@@ -0,0 +1,53 @@
+import os
+import time
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from app.pool import create_pool
+from app.tasks import import_feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Параллельно импортирует прайс-листы нескольких магазинов "
+        "по ссылкам или из файлов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="+", help="Ссылки или пути к файлам")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Число процессов, по умолчанию число ядер",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        failed = 0
+        with create_pool(options["workers"]) as executor:
+            futures = {
+                executor.submit(import_feed, source): source
+                for source in options["sources"]
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                if result["Status"]:
+                    self.stdout.write(
+                        f"{futures[future]}: {result['shop']}, "
+                        f"прочитано {result['parsed']}, "
+                        f"создано {result['created']}, "
+                        f"обновлено {result['updated']}, "
+                        f"без изменений {result['unchanged']}, "
+                        f"удалено {result['deleted']}, "
+                        f"ошибок {len(result['Errors'])}"
+                    )
+                else:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {result['Errors']}")
+
+        self.stdout.write(
+            f"Импортировано {len(futures) - failed} из {len(futures)} "
+            f"за {time.perf_counter() - started:.2f} с"
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.readmodel import rebuild_best_offers, rebuild_catalog_entries
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает каталог для чтения (CatalogEntry) и лучшие предложения "
+        "(BestOffer) по текущим данным"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "shops",
+            nargs="*",
+            type=int,
+            help="Идентификаторы магазинов, по умолчанию все",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_catalog_entries(options["shops"] or None)
+            rebuild_best_offers(options["shops"] or None)
+        self.stdout.write("Каталог для чтения пересобран")
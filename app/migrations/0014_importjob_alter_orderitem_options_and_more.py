@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_confirmemailtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(blank=True, verbose_name='Ссылка')),
+                ('state', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('parsed', models.PositiveIntegerField(default=0, verbose_name='Прочитано товаров')),
+                ('written', models.PositiveIntegerField(default=0, verbose_name='Записано товаров')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Ошибки')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Задача импорта',
+                'verbose_name_plural': 'Задачи импорта',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='orderitem',
+            options={'verbose_name': 'Заказанная позиция', 'verbose_name_plural': 'Список заказанных позиций'},
+        ),
+        migrations.RenameField(
+            model_name='orderitem',
+            old_name='product',
+            new_name='product_info',
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='state',
+            field=models.BooleanField(default=True, verbose_name='статус получения заказов'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order_id', 'product_info'), name='unique_order_item'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
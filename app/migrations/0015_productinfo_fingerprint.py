@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_importjob_alter_orderitem_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinfo',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32, verbose_name='Хеш содержимого'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_productinfo_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Last-Modified'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='state',
+            field=models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('skipped', 'Без изменений'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_importjob_etag_importjob_last_modified_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='file',
+            field=models.FileField(blank=True, upload_to='imports/', verbose_name='Файл'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0017_importjob_file"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductInfoStage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.UUIDField(db_index=True, verbose_name="Импорт")),
+                ("external_id", models.PositiveIntegerField(verbose_name="Внешний ИД")),
+                ("model", models.CharField(blank=True, max_length=50)),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "price_rrc",
+                    models.PositiveIntegerField(
+                        verbose_name="Рекомендуемая розничная цена"
+                    ),
+                ),
+                (
+                    "fingerprint",
+                    models.CharField(max_length=32, verbose_name="Хеш содержимого"),
+                ),
+                (
+                    "parameters",
+                    models.JSONField(default=dict, verbose_name="Параметры"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staged_product_info",
+                        to="app.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staged_product_info",
+                        to="app.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка импорта",
+                "verbose_name_plural": "Строки импорта",
+            },
+        ),
+    ]
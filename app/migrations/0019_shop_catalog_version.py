@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0018_productinfostage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shop",
+            name="catalog_version",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Версия каталога"
+            ),
+        ),
+    ]
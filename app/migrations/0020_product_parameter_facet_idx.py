@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0019_shop_catalog_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productparameter",
+            index=models.Index(
+                fields=["parameter", "value", "product_info"],
+                name="product_parameter_facet_idx",
+            ),
+        ),
+    ]
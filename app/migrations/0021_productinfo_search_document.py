@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:51
+
+from django.db import migrations, models
+
+# Выражение совпадает с тем, что строит SearchVector в app.search
+SEARCH_INDEX_SQL = (
+    "CREATE INDEX productinfo_search_idx ON app_productinfo USING gin "
+    "(to_tsvector('russian'::regconfig, COALESCE(search_document, '')))"
+)
+
+
+def fill_search_document(apps, schema_editor):
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    ProductParameter = apps.get_model("app", "ProductParameter")
+    queryset = ProductInfo.objects.select_related("product__category").order_by("id")
+    last_id = 0
+    while batch := list(queryset.filter(id__gt=last_id)[:1000]):
+        values = {}
+        for product_info_id, value in ProductParameter.objects.filter(
+            product_info__in=batch
+        ).values_list("product_info_id", "value"):
+            values.setdefault(product_info_id, []).append(value)
+        for product_info in batch:
+            product = product_info.product
+            product_info.search_document = " ".join(
+                part
+                for part in (
+                    product.name,
+                    product_info.model,
+                    product.category.name,
+                    *values.get(product_info.id, ()),
+                )
+                if part
+            )
+        ProductInfo.objects.bulk_update(batch, ["search_document"])
+        last_id = batch[-1].id
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SEARCH_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS productinfo_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0020_product_parameter_facet_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productinfo",
+            name="search_document",
+            field=models.TextField(
+                blank=True, default="", verbose_name="Текст для поиска"
+            ),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_catalog_entries(apps, schema_editor):
+    CatalogEntry = apps.get_model("app", "CatalogEntry")
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    ProductParameter = apps.get_model("app", "ProductParameter")
+    queryset = ProductInfo.objects.select_related("shop", "product__category")
+    last_id = 0
+    while batch := list(queryset.filter(id__gt=last_id).order_by("id")[:1000]):
+        parameters = {}
+        for product_info_id, name, value in ProductParameter.objects.filter(
+            product_info__in=batch
+        ).values_list("product_info_id", "parameter__name", "value"):
+            parameters.setdefault(product_info_id, {})[name] = value
+        CatalogEntry.objects.bulk_create(
+            CatalogEntry(
+                product_info_id=product_info.id,
+                shop_id=product_info.shop_id,
+                shop_name=product_info.shop.name,
+                shop_state=product_info.shop.state,
+                category_id=product_info.product.category_id,
+                category_name=product_info.product.category.name,
+                product_id=product_info.product_id,
+                product_name=product_info.product.name,
+                model=product_info.model,
+                external_id=product_info.external_id,
+                quantity=product_info.quantity,
+                price=product_info.price,
+                price_rrc=product_info.price_rrc,
+                parameters=parameters.get(product_info.id, {}),
+            )
+            for product_info in batch
+        )
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0021_productinfo_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogEntry",
+            fields=[
+                (
+                    "product_info",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="catalog_entry",
+                        serialize=False,
+                        to="app.productinfo",
+                        verbose_name="Информация о продукте",
+                    ),
+                ),
+                (
+                    "shop_name",
+                    models.CharField(max_length=50, verbose_name="Название магазина"),
+                ),
+                (
+                    "shop_state",
+                    models.BooleanField(verbose_name="Магазин принимает заказы"),
+                ),
+                (
+                    "category_name",
+                    models.CharField(max_length=50, verbose_name="Название категории"),
+                ),
+                (
+                    "product_name",
+                    models.CharField(max_length=50, verbose_name="Название продукта"),
+                ),
+                ("model", models.CharField(blank=True, max_length=50)),
+                ("external_id", models.PositiveIntegerField(verbose_name="Внешний ИД")),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "price_rrc",
+                    models.PositiveIntegerField(
+                        verbose_name="Рекомендуемая розничная цена"
+                    ),
+                ),
+                (
+                    "parameters",
+                    models.JSONField(default=dict, verbose_name="Параметры"),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="app.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="app.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="app.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка каталога",
+                "verbose_name_plural": "Каталог для чтения",
+                "indexes": [
+                    models.Index(
+                        fields=["shop", "product_info"], name="catalog_entry_shop_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "product_info"],
+                        name="catalog_entry_category_idx",
+                    ),
+                    models.Index(
+                        fields=["price", "product_info"], name="catalog_entry_price_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_catalog_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_best_offers(apps, schema_editor):
+    BestOffer = apps.get_model("app", "BestOffer")
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    offers = {}
+    for product_info in (
+        ProductInfo.objects.filter(shop__state=True, quantity__gt=0)
+        .select_related("shop", "product")
+        .order_by("product_id", "price", "id")
+        .iterator()
+    ):
+        if product_info.product_id in offers:
+            offers[product_info.product_id].offer_count += 1
+        else:
+            offers[product_info.product_id] = BestOffer(
+                product_id=product_info.product_id,
+                product_name=product_info.product.name,
+                category_id=product_info.product.category_id,
+                product_info_id=product_info.id,
+                shop_id=product_info.shop_id,
+                shop_name=product_info.shop.name,
+                price=product_info.price,
+                offer_count=1,
+            )
+    BestOffer.objects.bulk_create(offers.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0022_catalogentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BestOffer",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="best_offer",
+                        serialize=False,
+                        to="app.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+                (
+                    "product_name",
+                    models.CharField(max_length=50, verbose_name="Название продукта"),
+                ),
+                (
+                    "shop_name",
+                    models.CharField(max_length=50, verbose_name="Название магазина"),
+                ),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "offer_count",
+                    models.PositiveIntegerField(verbose_name="Число предложений"),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="best_offers",
+                        to="app.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+                (
+                    "product_info",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="best_offers",
+                        to="app.productinfo",
+                        verbose_name="Информация о продукте",
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="best_offers",
+                        to="app.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Лучшее предложение",
+                "verbose_name_plural": "Лучшие предложения",
+                "indexes": [
+                    models.Index(
+                        fields=["category", "price", "product"],
+                        name="best_offer_category_idx",
+                    ),
+                    models.Index(
+                        fields=["price", "product"], name="best_offer_price_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_best_offers, migrations.RunPython.noop),
+    ]
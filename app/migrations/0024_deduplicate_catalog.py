@@ -0,0 +1,110 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min
+
+
+def merge_products(apps, affected):
+    """
+    Сводит продукты с одинаковыми (name, category) к продукту с меньшим id
+    """
+    Product = apps.get_model("app", "Product")
+    duplicates = (
+        Product.objects.values("name", "category_id")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = list(
+            Product.objects.filter(
+                name=duplicate["name"], category_id=duplicate["category_id"]
+            )
+            .exclude(id=duplicate["keep"])
+            .values_list("id", flat=True)
+        )
+        for model_name in ("ProductInfo", "ProductInfoStage", "CatalogEntry"):
+            apps.get_model("app", model_name).objects.filter(
+                product_id__in=extra
+            ).update(product_id=duplicate["keep"])
+        Product.objects.filter(id__in=extra).delete()
+        affected.add(duplicate["keep"])
+
+
+def merge_product_infos(apps, affected):
+    """
+    Оставляет по (shop, external_id) последний записанный товар,
+    позиции заказов переносятся на него
+    """
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    OrderItem = apps.get_model("app", "OrderItem")
+    duplicates = (
+        ProductInfo.objects.values("shop_id", "external_id")
+        .annotate(keep=Max("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = ProductInfo.objects.filter(
+            shop_id=duplicate["shop_id"], external_id=duplicate["external_id"]
+        ).exclude(id=duplicate["keep"])
+        affected.update(extra.values_list("product_id", flat=True))
+        for item in OrderItem.objects.filter(product_info__in=extra):
+            kept = OrderItem.objects.filter(
+                order_id=item.order_id, product_info_id=duplicate["keep"]
+            ).first()
+            if kept is None:
+                item.product_info_id = duplicate["keep"]
+                item.save(update_fields=["product_info"])
+            else:
+                kept.quantity += item.quantity
+                kept.save(update_fields=["quantity"])
+                item.delete()
+        extra.delete()
+
+
+def refill_best_offers(apps, product_ids):
+    BestOffer = apps.get_model("app", "BestOffer")
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    BestOffer.objects.filter(product_id__in=product_ids).delete()
+    offers = {}
+    for product_info in (
+        ProductInfo.objects.filter(
+            product_id__in=product_ids, shop__state=True, quantity__gt=0
+        )
+        .select_related("shop", "product")
+        .order_by("product_id", "price", "id")
+    ):
+        if product_info.product_id in offers:
+            offers[product_info.product_id].offer_count += 1
+        else:
+            offers[product_info.product_id] = BestOffer(
+                product_id=product_info.product_id,
+                product_name=product_info.product.name,
+                category_id=product_info.product.category_id,
+                product_info_id=product_info.id,
+                shop_id=product_info.shop_id,
+                shop_name=product_info.shop.name,
+                price=product_info.price,
+                offer_count=1,
+            )
+    BestOffer.objects.bulk_create(offers.values())
+
+
+def deduplicate_catalog(apps, schema_editor):
+    affected = set()
+    merge_products(apps, affected)
+    merge_product_infos(apps, affected)
+    if affected:
+        refill_best_offers(apps, affected)
+
+
+class Migration(migrations.Migration):
+    """
+    Убирает дубликаты перед уникальными ограничениями на Product
+    и ProductInfo в следующей миграции
+    """
+
+    dependencies = [
+        ("app", "0023_bestoffer"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_catalog, migrations.RunPython.noop),
+    ]
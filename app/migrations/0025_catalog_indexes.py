@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0024_deduplicate_catalog"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="name",
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name="parameter",
+            name="name",
+            field=models.CharField(
+                db_index=True, max_length=60, verbose_name="Название параметра"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["user", "state"], name="order_user_state_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("name", "category"), name="unique_product"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productinfo",
+            constraint=models.UniqueConstraint(
+                fields=("shop", "external_id"), name="unique_product_info"
+            ),
+        ),
+    ]
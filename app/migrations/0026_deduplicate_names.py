@@ -0,0 +1,123 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def duplicates(model):
+    """
+    Возвращает пары (оставляемый id, id дубликатов) по одинаковому name
+    """
+    for duplicate in (
+        model.objects.values("name")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    ):
+        extra = list(
+            model.objects.filter(name=duplicate["name"])
+            .exclude(id=duplicate["keep"])
+            .values_list("id", flat=True)
+        )
+        yield duplicate["keep"], extra
+
+
+def merge_parameters(apps):
+    """
+    Сводит параметры с одинаковым названием к параметру с меньшим id
+    """
+    Parameter = apps.get_model("app", "Parameter")
+    ProductParameter = apps.get_model("app", "ProductParameter")
+    for keep, extra in duplicates(Parameter):
+        kept = ProductParameter.objects.filter(parameter_id=keep).values(
+            "product_info_id"
+        )
+        ProductParameter.objects.filter(
+            parameter_id__in=extra, product_info_id__in=kept
+        ).delete()
+        ProductParameter.objects.filter(parameter_id__in=extra).update(
+            parameter_id=keep
+        )
+        Parameter.objects.filter(id__in=extra).delete()
+
+
+def merge_categories(apps, affected):
+    """
+    Сводит категории с одинаковым названием к категории с меньшим id,
+    продукты с совпавшим названием объединяются
+    """
+    Category = apps.get_model("app", "Category")
+    Product = apps.get_model("app", "Product")
+    for keep, extra in duplicates(Category):
+        category = Category.objects.get(id=keep)
+        category.shop.add(
+            *Category.shop.through.objects.filter(category_id__in=extra).values_list(
+                "shop_id", flat=True
+            )
+        )
+        for product in Product.objects.filter(category_id__in=extra):
+            kept = Product.objects.filter(category_id=keep, name=product.name).first()
+            if kept is None:
+                product.category_id = keep
+                product.save(update_fields=["category"])
+                affected.add(product.id)
+                continue
+            for model_name in ("ProductInfo", "ProductInfoStage", "CatalogEntry"):
+                apps.get_model("app", model_name).objects.filter(
+                    product_id=product.id
+                ).update(product_id=kept.id)
+            product.delete()
+            affected.add(kept.id)
+        for model_name in ("CatalogEntry", "BestOffer"):
+            apps.get_model("app", model_name).objects.filter(
+                category_id__in=extra
+            ).update(category_id=keep)
+        Category.objects.filter(id__in=extra).delete()
+
+
+def refill_best_offers(apps, product_ids):
+    BestOffer = apps.get_model("app", "BestOffer")
+    ProductInfo = apps.get_model("app", "ProductInfo")
+    BestOffer.objects.filter(product_id__in=product_ids).delete()
+    offers = {}
+    for product_info in (
+        ProductInfo.objects.filter(
+            product_id__in=product_ids, shop__state=True, quantity__gt=0
+        )
+        .select_related("shop", "product")
+        .order_by("product_id", "price", "id")
+    ):
+        if product_info.product_id in offers:
+            offers[product_info.product_id].offer_count += 1
+        else:
+            offers[product_info.product_id] = BestOffer(
+                product_id=product_info.product_id,
+                product_name=product_info.product.name,
+                category_id=product_info.product.category_id,
+                product_info_id=product_info.id,
+                shop_id=product_info.shop_id,
+                shop_name=product_info.shop.name,
+                price=product_info.price,
+                offer_count=1,
+            )
+    BestOffer.objects.bulk_create(offers.values())
+
+
+def deduplicate_names(apps, schema_editor):
+    affected = set()
+    merge_parameters(apps)
+    merge_categories(apps, affected)
+    if affected:
+        refill_best_offers(apps, affected)
+
+
+class Migration(migrations.Migration):
+    """
+    Убирает дубликаты категорий и параметров перед уникальными
+    названиями в следующей миграции
+    """
+
+    dependencies = [
+        ("app", "0025_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_names, migrations.RunPython.noop),
+    ]
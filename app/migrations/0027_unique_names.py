@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0026_deduplicate_names"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="name",
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="parameter",
+            name="name",
+            field=models.CharField(
+                max_length=60, unique=True, verbose_name="Название параметра"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0027_unique_names"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productinfostage",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Загружена",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0028_productinfostage_created_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productinfo",
+            index=models.Index(fields=["price", "id"], name="product_info_price_idx"),
+        ),
+    ]
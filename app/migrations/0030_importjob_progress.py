@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0029_productinfo_price_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="staged",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Подготовлено товаров"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Последний прогресс",
+            ),
+            preserve_default=False,
+        ),
+    ]
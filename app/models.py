@@ -2,10 +2,10 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django_rest_passwordreset.tokens import get_token_generator
 
-
 STATE_CHOICES = (
     ("basket", "Статус корзины"),
     ("new", "Новый"),
@@ -16,6 +16,14 @@ STATE_CHOICES = (
     ("canceled", "Отменен"),
 )
 
+IMPORT_STATE_CHOICES = (
+    ("queued", "В очереди"),
+    ("running", "Выполняется"),
+    ("done", "Завершен"),
+    ("skipped", "Без изменений"),
+    ("failed", "Ошибка"),
+)
+
 USER_TYPE_CHOICES = (
     ("shop", "Магазин"),
     ("buyer", "Покупатель"),
@@ -117,6 +125,9 @@ class Shop(models.Model):
         on_delete=models.CASCADE,
     )
     state = models.BooleanField(verbose_name="статус получения заказов", default=True)
+    catalog_version = models.PositiveIntegerField(
+        verbose_name="Версия каталога", default=0
+    )
 
     class Meta:
         verbose_name = "Магазин"
@@ -130,7 +141,7 @@ class Category(models.Model):
     shop = models.ManyToManyField(
         Shop, verbose_name="shop_category", related_name="categories"
     )
-    name = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, unique=True)
 
     def __str__(self) -> str:
         return f"{self.name}"
@@ -149,6 +160,9 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Список продуктов"
+        constraints = [
+            models.UniqueConstraint(fields=["name", "category"], name="unique_product"),
+        ]
 
     def __str__(self):
         return self.name
@@ -174,14 +188,66 @@ class ProductInfo(models.Model):
     price = models.PositiveIntegerField(verbose_name="Цена")
     price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая розничная цена")
     external_id = models.PositiveIntegerField(verbose_name="Внешний ИД", blank=True)
+    fingerprint = models.CharField(
+        verbose_name="Хеш содержимого", max_length=32, blank=True, default=""
+    )
+    search_document = models.TextField(
+        verbose_name="Текст для поиска", blank=True, default=""
+    )
 
     class Meta:
         verbose_name = "Информация о прдукте"
         verbose_name_plural = "Список информации о продукте"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shop", "external_id"], name="unique_product_info"
+            ),
+        ]
+        indexes = [
+            # курсор каталога с ordering=price/-price идет по индексу
+            models.Index(fields=["price", "id"], name="product_info_price_idx"),
+        ]
+
+
+class ProductInfoStage(models.Model):
+    """
+    Измененная строка прайс-листа, ожидающая публикации каталога магазина
+    """
+
+    objects = models.manager.Manager()
+    token = models.UUIDField(verbose_name="Импорт", db_index=True)
+    shop = models.ForeignKey(
+        Shop,
+        related_name="staged_product_info",
+        on_delete=models.CASCADE,
+        verbose_name="Магазин",
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name="staged_product_info",
+        on_delete=models.CASCADE,
+        verbose_name="Продукт",
+    )
+    external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
+    model = models.CharField(max_length=50, blank=True)
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая розничная цена")
+    fingerprint = models.CharField(verbose_name="Хеш содержимого", max_length=32)
+    parameters = models.JSONField(verbose_name="Параметры", default=dict)
+    created_at = models.DateTimeField(
+        verbose_name="Загружена", auto_now_add=True, db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Строка импорта"
+        verbose_name_plural = "Строки импорта"
 
 
 class Parameter(models.Model):
-    name = models.CharField(max_length=60, verbose_name="Название параметра")
+    name = models.CharField(
+        max_length=60, verbose_name="Название параметра", unique=True
+    )
 
     class Meta:
         verbose_name = "Параметр"
@@ -211,11 +277,137 @@ class ProductParameter(models.Model):
     class Meta:
         verbose_name = "Продукт и Параметр"
         verbose_name_plural = "Список продуктов и параметров"
+        indexes = [
+            # список товаров для пары (параметр, значение) читается
+            # из индекса без обращения к таблице
+            models.Index(
+                fields=["parameter", "value", "product_info"],
+                name="product_parameter_facet_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class CatalogEntry(models.Model):
+    """
+    Плоская строка каталога для чтения: товар магазина со всеми данными
+
+    Заполняется импортом для записанных им товаров и удаляется вместе
+    с ProductInfo, поэтому списку каталога не нужны соединения таблиц.
+    """
+
+    objects = models.manager.Manager()
+    product_info = models.OneToOneField(
+        ProductInfo,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        verbose_name="Информация о продукте",
+        related_name="catalog_entry",
+    )
+    shop = models.ForeignKey(
+        Shop,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Магазин",
+        related_name="catalog_entries",
+    )
+    shop_name = models.CharField(verbose_name="Название магазина", max_length=50)
+    shop_state = models.BooleanField(verbose_name="Магазин принимает заказы")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Категория",
+        related_name="catalog_entries",
+    )
+    category_name = models.CharField(verbose_name="Название категории", max_length=50)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        verbose_name="Продукт",
+        related_name="catalog_entries",
+    )
+    product_name = models.CharField(verbose_name="Название продукта", max_length=50)
+    model = models.CharField(max_length=50, blank=True)
+    external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая розничная цена")
+    parameters = models.JSONField(verbose_name="Параметры", default=dict)
+
+    class Meta:
+        verbose_name = "Строка каталога"
+        verbose_name_plural = "Каталог для чтения"
+        indexes = [
+            models.Index(
+                fields=["shop", "product_info"], name="catalog_entry_shop_idx"
+            ),
+            models.Index(
+                fields=["category", "product_info"], name="catalog_entry_category_idx"
+            ),
+            models.Index(
+                fields=["price", "product_info"], name="catalog_entry_price_idx"
+            ),
+        ]
+
+
+class BestOffer(models.Model):
+    """
+    Лучшее предложение продукта: самая низкая цена среди товаров
+    в наличии у включенных магазинов
+
+    Пересчитывается импортом для затронутых продуктов и сменой
+    статуса магазина для его продуктов; продукт без предложений
+    в таблице отсутствует.
+    """
+
+    objects = models.manager.Manager()
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        verbose_name="Продукт",
+        related_name="best_offer",
+    )
+    product_name = models.CharField(verbose_name="Название продукта", max_length=50)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Категория",
+        related_name="best_offers",
+    )
+    product_info = models.ForeignKey(
+        ProductInfo,
+        on_delete=models.CASCADE,
+        verbose_name="Информация о продукте",
+        related_name="best_offers",
+    )
+    shop = models.ForeignKey(
+        Shop,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Магазин",
+        related_name="best_offers",
+    )
+    shop_name = models.CharField(verbose_name="Название магазина", max_length=50)
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    offer_count = models.PositiveIntegerField(verbose_name="Число предложений")
+
+    class Meta:
+        verbose_name = "Лучшее предложение"
+        verbose_name_plural = "Лучшие предложения"
+        indexes = [
+            models.Index(
+                fields=["category", "price", "product"],
+                name="best_offer_category_idx",
+            ),
+            models.Index(fields=["price", "product"], name="best_offer_price_idx"),
+        ]
+
+
 class Contact(models.Model):
     objects = models.manager.Manager()
     user = models.ForeignKey(
@@ -262,6 +454,10 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # корзина и заказы пользователя ищутся по паре (user, state)
+            models.Index(fields=["user", "state"], name="order_user_state_idx"),
+        ]
 
     def __str__(self):
         return self.dt, self.status
@@ -334,3 +530,52 @@ class ConfirmEmailToken(models.Model):
 
     def __str__(self):
         return "Password reset token for user {user}".format(user=self.user)
+
+
+class ImportJob(models.Model):
+    """
+    Фоновая задача импорта прайс-листа поставщика
+    """
+
+    objects = models.manager.Manager()
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        related_name="import_jobs",
+        on_delete=models.CASCADE,
+    )
+    url = models.URLField(verbose_name="Ссылка", blank=True)
+    file = models.FileField(verbose_name="Файл", upload_to="imports/", blank=True)
+    state = models.CharField(
+        verbose_name="Статус",
+        choices=IMPORT_STATE_CHOICES,
+        max_length=10,
+        default="queued",
+    )
+    parsed = models.PositiveIntegerField(verbose_name="Прочитано товаров", default=0)
+    staged = models.PositiveIntegerField(verbose_name="Подготовлено товаров", default=0)
+    written = models.PositiveIntegerField(verbose_name="Записано товаров", default=0)
+    errors = models.JSONField(verbose_name="Ошибки", default=list, blank=True)
+    etag = models.CharField(verbose_name="ETag", max_length=255, blank=True)
+    last_modified = models.CharField(
+        verbose_name="Last-Modified", max_length=64, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(verbose_name="Последний прогресс", auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Задача импорта"
+        verbose_name_plural = "Задачи импорта"
+
+    def __str__(self):
+        return f"{self.url} {self.state}"
+
+    @property
+    def duration(self):
+        """Длительность импорта в секундах"""
+        if not self.started_at:
+            return None
+        finished_at = self.finished_at or timezone.now()
+        return (finished_at - self.started_at).total_seconds()
@@ -0,0 +1,202 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from json import dumps, loads
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ProductInfoCursorPagination(CursorPagination):
+    """
+    Постраничный вывод каталога по составному курсору
+
+    Курсор хранит значения всех полей сортировки последней строки
+    страницы, и следующая страница выбирается условием
+    (price, id) > (курсор) по индексу с теми же колонками, а не OFFSET,
+    поэтому дальние страницы стоят столько же, сколько первая, даже
+    внутри длинной серии одинаковых цен. Ключ выбирается параметром
+    ordering: id (по умолчанию), price или -price; id замыкает
+    сортировку, чтобы ключ был уникальным.
+    """
+
+    ordering = ("id",)
+    orderings = {
+        "id": ("id",),
+        "price": ("price", "id"),
+        "-price": ("-price", "-id"),
+    }
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get("ordering"), self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request)
+        ordering = _reverse(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(_after(queryset.model, ordering, position))
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # страница, открытая курсором, имеет соседа с той стороны,
+        # откуда пришли
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
+
+    def decode_cursor(self, request):
+        """
+        Значения ключа и направление из параметра cursor.
+
+        Returns:
+        - tuple: (значения полей сортировки или None, назад ли).
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = loads(urlsafe_b64decode(encoded.encode("ascii")))
+            position, reverse = cursor["p"], bool(cursor.get("r"))
+        except (Base64Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+            or not all(isinstance(value, int) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, row, reverse=False):
+        cursor = {"p": [_value(row, field) for field in self.ordering]}
+        if reverse:
+            cursor["r"] = 1
+        encoded = urlsafe_b64encode(dumps(cursor).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+def _reverse(ordering):
+    return tuple(
+        field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+    )
+
+
+def _value(row, field):
+    name = field.lstrip("-")
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, row._meta.get_field(name).attname)
+
+
+def _after(model, ordering, position):
+    """
+    Условие «строка после курсора» сравнением кортежей колонок.
+
+    Все поля сортировки идут в одну сторону, поэтому условие
+    (a, b) > (x, y) совпадает с порядком составного индекса (a, b).
+    """
+    descending = {field.startswith("-") for field in ordering}
+    if len(descending) != 1:
+        raise ValueError("Поля сортировки курсора должны идти в одну сторону")
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        f"{quote(model._meta.db_table)}."
+        f"{quote(model._meta.get_field(field.lstrip('-')).column)}"
+        for field in ordering
+    )
+    placeholders = ", ".join(["%s"] * len(position))
+    operator = "<" if descending.pop() else ">"
+    return RawSQL(
+        f"({columns}) {operator} ({placeholders})",
+        position,
+        output_field=BooleanField(),
+    )
+
+
+class DirectoryCursorPagination(CursorPagination):
+    """
+    Постраничный вывод справочников магазинов и категорий по курсору
+
+    Курсор не требует подсчета строк, поэтому страница - один запрос.
+    """
+
+    ordering = ("id",)
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Постраничный вывод результатов поиска
+
+    Результаты упорядочены по релевантности, поэтому курсор по ключу
+    не подходит; страницы нумеруются, а глубина выдачи невелика.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class CatalogCursorPagination(ProductInfoCursorPagination):
+    """
+    Постраничный вывод каталога для чтения по курсору
+
+    Ключ строки каталога - идентификатор ProductInfo.
+    """
+
+    ordering = ("product_info",)
+    orderings = {
+        "id": ("product_info",),
+        "price": ("price", "product_info"),
+        "-price": ("-price", "-product_info"),
+    }
+
+
+class BestOfferCursorPagination(ProductInfoCursorPagination):
+    """
+    Постраничный вывод лучших предложений по курсору
+
+    По умолчанию сначала самые дешевые; ключ строки - идентификатор
+    продукта.
+    """
+
+    ordering = ("price", "product")
+    orderings = {
+        "id": ("product",),
+        "price": ("price", "product"),
+        "-price": ("-price", "-product"),
+    }
@@ -0,0 +1,316 @@
+import csv
+from io import TextIOWrapper
+from os.path import splitext
+
+from ujson import load as load_json
+from ujson import loads as loads_json
+from yaml.composer import ComposerError
+from yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+try:
+    from yaml import CSafeLoader as StreamLoader
+except ImportError:
+    from yaml import SafeLoader as StreamLoader
+
+SECTIONS = ("categories", "goods")
+
+PARSERS = {}
+CONTENT_TYPES = {}
+EXTENSIONS = {}
+DEFAULT_FORMAT = "yaml"
+
+
+def register_parser(name, content_types=(), extensions=()):
+    """
+    Регистрирует разборщик прайс-листа для формата.
+
+    Разборщик принимает бинарный файл и возвращает поток пар
+    (ключ, значение) в формате iter_yaml.
+
+    Args:
+    - name (str): название формата.
+    - content_types (tuple): MIME-типы формата.
+    - extensions (tuple): расширения файлов формата.
+    """
+
+    def decorator(parser):
+        PARSERS[name] = parser
+        CONTENT_TYPES.update(dict.fromkeys(content_types, name))
+        EXTENSIONS.update(dict.fromkeys(extensions, name))
+        return parser
+
+    return decorator
+
+
+def get_format(content_type="", filename=""):
+    """
+    Определяет формат по MIME-типу, затем по расширению файла
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CONTENT_TYPES:
+        return CONTENT_TYPES[content_type]
+    extension = splitext(filename or "")[1].lower()
+    return EXTENSIONS.get(extension, DEFAULT_FORMAT)
+
+
+def iter_price_list(stream, content_type="", filename=""):
+    """
+    Разбирает прайс-лист подходящим для формата разборщиком.
+
+    Args:
+    - stream (file-like): бинарный файл прайс-листа.
+    - content_type (str): MIME-тип из заголовка Content-Type.
+    - filename (str): имя файла или путь ссылки.
+
+    Returns:
+    - Iterator[tuple]: пары (ключ, значение).
+    """
+    return PARSERS[get_format(content_type, filename)](stream)
+
+
+@register_parser(
+    "yaml",
+    content_types=(
+        "application/yaml",
+        "application/x-yaml",
+        "text/yaml",
+        "text/x-yaml",
+    ),
+    extensions=(".yaml", ".yml"),
+)
+def iter_yaml(stream):
+    """
+    Потоково разбирает YAML прайс-лист поставщика.
+
+    Документ читается по событиям парсера (LibYAML, если доступен),
+    поэтому в памяти одновременно находится только один товар.
+
+    Args:
+    - stream (file-like | bytes | str): содержимое прайс-листа.
+
+    Yields:
+    - tuple: пары (ключ, значение); для разделов categories и goods
+      возвращается по одной паре на каждый элемент списка.
+    """
+    loader = StreamLoader(stream)
+    try:
+        loader.get_event()
+        if loader.check_event(StreamEndEvent):
+            return
+        loader.get_event()
+        if not loader.check_event(MappingStartEvent):
+            raise ComposerError(
+                None, None, "expected a mapping", loader.peek_event().start_mark
+            )
+        loader.get_event()
+
+        while not loader.check_event(MappingEndEvent):
+            key = _construct(loader, loader.get_event())
+            if key in SECTIONS and loader.check_event(SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(SequenceEndEvent):
+                    yield key, _construct(loader, loader.get_event())
+                loader.get_event()
+            else:
+                value = _construct(loader, loader.get_event())
+                # пустой раздел (goods: без значения) - это пустой список,
+                # как в iter_records
+                if key not in SECTIONS or value is not None:
+                    yield key, value
+    finally:
+        loader.dispose()
+
+
+def _compose(loader, event):
+    if isinstance(event, AliasEvent):
+        raise ComposerError(None, None, "aliases are not supported", event.start_mark)
+    if isinstance(event, ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(ScalarNode, event.value, event.implicit)
+        return ScalarNode(tag, event.value, event.start_mark, event.end_mark)
+
+    if isinstance(event, SequenceStartEvent):
+        node = SequenceNode(
+            _resolve_tag(loader, SequenceNode, event), [], event.start_mark
+        )
+        while not loader.check_event(SequenceEndEvent):
+            node.value.append(_compose(loader, loader.get_event()))
+    else:
+        node = MappingNode(
+            _resolve_tag(loader, MappingNode, event), [], event.start_mark
+        )
+        while not loader.check_event(MappingEndEvent):
+            key = _compose(loader, loader.get_event())
+            node.value.append((key, _compose(loader, loader.get_event())))
+    node.end_mark = loader.get_event().end_mark
+    return node
+
+
+def _resolve_tag(loader, kind, event):
+    if event.tag is None or event.tag == "!":
+        return loader.resolve(kind, None, event.implicit)
+    return event.tag
+
+
+def _construct(loader, event):
+    return loader.construct_document(_compose(loader, event))
+
+
+@register_parser("json", content_types=("application/json",), extensions=(".json",))
+def iter_json(stream):
+    """
+    Разбирает JSON прайс-лист той же структуры, что и YAML.
+
+    Документ читается целиком через ujson: это намного быстрее YAML,
+    но память растет с размером файла.
+    """
+    return iter_records(load_json(stream))
+
+
+def iter_records(data):
+    """
+    Превращает словарь прайс-листа в поток пар (ключ, значение)
+    """
+    for key, value in data.items():
+        if key in SECTIONS:
+            for item in value or []:
+                yield key, item
+        else:
+            yield key, value
+
+
+CSV_COLUMNS = {
+    "id": int,
+    "category": int,
+    "name": str,
+    "model": str,
+    "price": int,
+    "price_rrc": int,
+    "quantity": int,
+}
+# Колонки магазина и категории в построчных форматах
+HEADER_COLUMNS = ("shop", "url", "category_name")
+# Префикс колонки параметра, имя которого занято колонкой товара
+PARAMETER_PREFIX = "parameter:"
+
+
+def csv_parameter_column(name):
+    """
+    Колонка CSV для параметра.
+
+    Параметр с именем колонки товара или шапки (например, price)
+    выводится с префиксом PARAMETER_PREFIX, иначе при разборе
+    он заменил бы поле товара.
+    """
+    if (
+        name in CSV_COLUMNS
+        or name in HEADER_COLUMNS
+        or name.startswith(PARAMETER_PREFIX)
+    ):
+        return PARAMETER_PREFIX + name
+    return name
+
+
+@register_parser(
+    "csv",
+    content_types=("text/csv", "application/csv"),
+    extensions=(".csv",),
+)
+def iter_csv(stream):
+    """
+    Построчно разбирает CSV прайс-лист.
+
+    Одна строка - один товар. Колонки shop и url задают магазин,
+    category_name - название категории, колонки с префиксом
+    PARAMETER_PREFIX и остальные колонки кроме полей товара считаются
+    параметрами; пустые значения пропускаются.
+    """
+    text = TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from _iter_rows(_csv_row(row) for row in csv.DictReader(text))
+    finally:
+        # не закрываем файл вызывающего вместе с оберткой
+        text.detach()
+
+
+@register_parser(
+    "jsonl",
+    content_types=("application/x-ndjson", "application/jsonl"),
+    extensions=(".jsonl",),
+)
+def iter_json_lines(stream):
+    """
+    Построчно разбирает прайс-лист JSON Lines.
+
+    Одна строка - один товар с полями прайс-листа, параметрами
+    в parameters и полями shop, url и category_name, как в CSV;
+    пустые строки пропускаются.
+    """
+    yield from _iter_rows(loads_json(line) for line in stream if line.strip())
+
+
+def _convert_cell(convert, value):
+    """
+    Значение ячейки в типе колонки.
+
+    Пустая ячейка дает None, а значение, которое не приводится к типу,
+    остается строкой: импорт проверяет поля товара и записывает такую
+    строку в ошибки, не прерывая разбор остальных.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        return value
+
+
+def _csv_row(row):
+    item = {"parameters": {}}
+    for key, value in row.items():
+        if key in CSV_COLUMNS:
+            item[key] = _convert_cell(CSV_COLUMNS[key], value)
+        elif key is None:
+            # лишние ячейки строки без заголовка колонки отбрасываются
+            continue
+        elif key in HEADER_COLUMNS:
+            item[key] = value
+        elif value:
+            item["parameters"][key.removeprefix(PARAMETER_PREFIX)] = value
+    return item
+
+
+def _iter_rows(rows):
+    """
+    Поток пар (ключ, значение) из построчных товаров с шапкой в строке
+    """
+    header, categories = {}, set()
+    for row in rows:
+        for key in ("shop", "url"):
+            if row.get(key) and key not in header:
+                header[key] = row[key]
+                yield key, row[key]
+
+        # категория с нечисловым id не регистрируется, и товар с ней
+        # попадает в ошибки импорта как товар неизвестной категории
+        category = row.get("category")
+        if isinstance(category, int) and category not in categories:
+            categories.add(category)
+            yield "categories", {
+                "id": category,
+                "name": row.get("category_name"),
+            }
+        item = {key: row.get(key) for key in CSV_COLUMNS if key in row}
+        item["parameters"] = row.get("parameters") or {}
+        yield "goods", item
@@ -0,0 +1,26 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+# Модуль не импортирует модели: процессы spawn загружают его до django.setup()
+
+
+def create_pool(workers):
+    """
+    Создает пул процессов импорта, брокер не нужен.
+
+    Процессы запускаются через spawn, поэтому не наследуют открытые
+    соединения с базой данных. Общие для магазинов строки защищены
+    уникальными ключами в базе, поэтому импорты из разных пулов
+    и процессов не мешают друг другу.
+
+    Args:
+    - workers (int): число процессов.
+    """
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=django.setup,
+    )
@@ -0,0 +1,183 @@
+from django.db import transaction
+
+from .models import BestOffer, CatalogEntry, Product, ProductInfo, ProductParameter
+
+ENTRY_COLUMNS = {
+    "product_info_id": "id",
+    "shop_id": "shop_id",
+    "shop_name": "shop__name",
+    "shop_state": "shop__state",
+    "category_id": "product__category_id",
+    "category_name": "product__category__name",
+    "product_id": "product_id",
+    "product_name": "product__name",
+    "model": "model",
+    "external_id": "external_id",
+    "quantity": "quantity",
+    "price": "price",
+    "price_rrc": "price_rrc",
+}
+UPDATE_FIELDS = [
+    "shop_name",
+    "shop_state",
+    "category",
+    "category_name",
+    "product",
+    "product_name",
+    "model",
+    "external_id",
+    "quantity",
+    "price",
+    "price_rrc",
+    "parameters",
+]
+
+# Колонки лучшего предложения: поле BestOffer -> путь ProductInfo
+BEST_OFFER_COLUMNS = {
+    "product_id": "product_id",
+    "product_name": "product__name",
+    "category_id": "product__category_id",
+    "product_info_id": "id",
+    "shop_id": "shop_id",
+    "shop_name": "shop__name",
+    "price": "price",
+}
+BEST_OFFER_UPDATE_FIELDS = [
+    "product_name",
+    "category",
+    "product_info",
+    "shop",
+    "shop_name",
+    "price",
+    "offer_count",
+]
+
+
+def refresh_catalog_entries(product_info_ids):
+    """
+    Пересобирает строки каталога для чтения по текущим данным товаров.
+
+    Для каждой пачки товаров - одна выборка с соединениями, одна выборка
+    параметров и одна вставка с обновлением при конфликте.
+
+    Args:
+    - product_info_ids (list): идентификаторы ProductInfo одной пачки.
+    """
+    rows = ProductInfo.objects.filter(id__in=product_info_ids).values_list(
+        *ENTRY_COLUMNS.values()
+    )
+    parameters = {}
+    for product_info_id, name, value in ProductParameter.objects.filter(
+        product_info_id__in=product_info_ids
+    ).values_list("product_info_id", "parameter__name", "value"):
+        parameters.setdefault(product_info_id, {})[name] = value
+
+    CatalogEntry.objects.bulk_create(
+        [
+            CatalogEntry(
+                **dict(zip(ENTRY_COLUMNS, row)), parameters=parameters.get(row[0], {})
+            )
+            for row in rows
+        ],
+        update_conflicts=True,
+        unique_fields=["product_info"],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+def refresh_best_offers(product_ids):
+    """
+    Пересчитывает лучшие предложения продуктов.
+
+    Предложения продуктов читаются одной выборкой, упорядоченной
+    по цене, первое предложение каждого продукта - лучшее. Продукты
+    без предложений убираются из таблицы.
+
+    Строки продуктов блокируются до конца транзакции перед чтением
+    предложений, поэтому параллельные импорты разных магазинов
+    пересчитывают общий продукт по очереди, и второй видит цены,
+    записанные первым. Блокировки берутся по возрастанию id: вызывающий
+    код, держащий их до конца своей транзакции, должен передавать
+    продукты тоже по возрастанию, одним вызовом или пачками.
+
+    Args:
+    - product_ids (Iterable[int]): идентификаторы затронутых продуктов.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    offers = {}
+    with transaction.atomic():
+        list(
+            Product.objects.select_for_update()
+            .filter(id__in=product_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for row in (
+            ProductInfo.objects.filter(
+                product_id__in=product_ids, shop__state=True, quantity__gt=0
+            )
+            .order_by("product_id", "price", "id")
+            .values_list(*BEST_OFFER_COLUMNS.values())
+        ):
+            if row[0] in offers:
+                offers[row[0]].offer_count += 1
+            else:
+                offers[row[0]] = BestOffer(
+                    **dict(zip(BEST_OFFER_COLUMNS, row)), offer_count=1
+                )
+
+        BestOffer.objects.filter(product_id__in=product_ids - offers.keys()).delete()
+        BestOffer.objects.bulk_create(
+            offers.values(),
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=BEST_OFFER_UPDATE_FIELDS,
+        )
+
+
+def rebuild_best_offers(shop_ids=None, batch_size=1000):
+    """
+    Пересчитывает лучшие предложения продуктов магазинов.
+
+    Args:
+    - shop_ids (list): магазины; None - все продукты.
+    - batch_size (int): число продуктов в пачке.
+    """
+    products = ProductInfo.objects.values_list("product_id", flat=True)
+    if shop_ids is not None:
+        products = products.filter(shop_id__in=shop_ids)
+    else:
+        BestOffer.objects.exclude(
+            product__in=ProductInfo.objects.values("product_id")
+        ).delete()
+    products = products.distinct().order_by("product_id")
+
+    last_id = 0
+    while ids := list(products.filter(product_id__gt=last_id)[:batch_size]):
+        refresh_best_offers(ids)
+        last_id = ids[-1]
+
+
+def rebuild_catalog_entries(shop_ids=None, batch_size=1000):
+    """
+    Пересобирает каталог для чтения магазинов целиком.
+
+    Args:
+    - shop_ids (list): магазины; None - все магазины.
+    - batch_size (int): число товаров в пачке.
+    """
+    product_infos = ProductInfo.objects.order_by("id")
+    entries = CatalogEntry.objects.all()
+    if shop_ids is not None:
+        product_infos = product_infos.filter(shop_id__in=shop_ids)
+        entries = entries.filter(shop_id__in=shop_ids)
+    entries.exclude(product_info__in=product_infos.values("id")).delete()
+
+    last_id = 0
+    while ids := list(
+        product_infos.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+    ):
+        refresh_catalog_entries(ids)
+        last_id = ids[-1]
@@ -0,0 +1,168 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+
+from .models import ProductInfo, Shop
+
+# Конфигурация полнотекстового поиска PostgreSQL и индекс из миграции 0021
+SEARCH_CONFIG = "russian"
+
+TOKEN = re.compile(r"\w+")
+
+
+def search_document(name, model, category, values):
+    """
+    Текст товара для полнотекстового поиска.
+
+    Args:
+    - name (str): название продукта.
+    - model (str): модель.
+    - category (str): название категории.
+    - values (iterable): значения характеристик.
+
+    Returns:
+    - str: слова товара через пробел.
+    """
+    return " ".join(part for part in (name, model, category, *values) if part)
+
+
+def tokenize(text):
+    """
+    Слова текста в нижнем регистре для индекса в памяти
+    """
+    return TOKEN.findall(text.lower().replace("ё", "е"))
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс каталога в памяти процесса
+
+    Используется, когда база данных не умеет полнотекстовый поиск.
+    Товары каждого магазина перечитываются только после смены версии
+    его каталога, остальные магазины остаются в индексе как есть.
+    Ранжирование - BM25, все слова запроса должны встретиться в товаре.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._terms = {}
+        self._lengths = {}
+        self._total_length = 0
+        self._shops = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Перечитывает товары магазинов, версия каталога которых изменилась
+        """
+        versions = dict(Shop.objects.values_list("id", "catalog_version"))
+        with self._lock:
+            for shop_id in set(self._shops) - set(versions):
+                self._remove_shop(shop_id)
+            for shop_id, version in versions.items():
+                if shop_id in self._shops and self._shops[shop_id][0] == version:
+                    continue
+                self._remove_shop(shop_id)
+                documents = ProductInfo.objects.filter(shop_id=shop_id).values_list(
+                    "id", "search_document"
+                )
+                ids = []
+                for product_info_id, document in documents.iterator():
+                    self._add(product_info_id, document)
+                    ids.append(product_info_id)
+                self._shops[shop_id] = (version, ids)
+
+    def search(self, query):
+        """
+        Идентификаторы товаров по убыванию релевантности.
+
+        Args:
+        - query (str): поисковый запрос.
+
+        Returns:
+        - list: идентификаторы ProductInfo.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            ids = set(postings[0]).intersection(*postings[1:])
+
+            count = len(self._lengths)
+            average = self._total_length / count
+            scores = dict.fromkeys(ids, 0.0)
+            for posting in postings:
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for product_info_id in ids:
+                    frequency = posting[product_info_id]
+                    norm = (
+                        1 - self.b + self.b * self._lengths[product_info_id] / average
+                    )
+                    scores[product_info_id] += (
+                        idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                    )
+
+        return sorted(
+            ids, key=lambda product_info_id: (-scores[product_info_id], product_info_id)
+        )
+
+    def _add(self, product_info_id, document):
+        tokens = tokenize(document)
+        for term, frequency in Counter(tokens).items():
+            self._postings[term][product_info_id] = frequency
+        self._terms[product_info_id] = set(tokens)
+        self._lengths[product_info_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def _remove_shop(self, shop_id):
+        _, ids = self._shops.pop(shop_id, (None, ()))
+        for product_info_id in ids:
+            for term in self._terms.pop(product_info_id):
+                posting = self._postings[term]
+                del posting[product_info_id]
+                if not posting:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(product_info_id)
+
+
+_index = InvertedIndex()
+
+
+def search_product_ids(query):
+    """
+    Ищет товары по названию, модели, категории и значениям характеристик.
+
+    В PostgreSQL запрос выполняется по GIN-индексу поля search_document,
+    в остальных базах - по инвертированному индексу в памяти процесса.
+
+    Args:
+    - query (str): поисковый запрос.
+
+    Returns:
+    - QuerySet или list: идентификаторы ProductInfo по убыванию релевантности.
+    """
+    if connection.vendor == "postgresql":
+        vector = SearchVector("search_document", config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            ProductInfo.objects.annotate(
+                document=vector, rank=SearchRank(vector, search_query)
+            )
+            .filter(document=search_query)
+            .order_by("-rank", "id")
+            .values_list("id", flat=True)
+        )
+
+    _index.refresh()
+    return _index.search(query)
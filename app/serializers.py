@@ -1,5 +1,8 @@
 from rest_framework import serializers
+
 from .models import (
+    BestOffer,
+    CatalogEntry,
     Product,
     User,
     Category,
@@ -9,19 +12,21 @@ from .models import (
     OrderItem,
     Order,
     Contact,
+    ImportJob,
     Parameter,
 )
+from .shaping import ShapedSerializerMixin
 
 
-class ShopSerializer(serializers.ModelSerializer):
+class ShopSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Shop
         fields = ("id", "name", "url")
         read_only_fields = ("id",)
 
 
-class CategorySerializer(serializers.ModelSerializer):
-    shop = ShopSerializer()
+class CategorySerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    shop = ShopSerializer(many=True, read_only=True)
 
     class Meta:
         model = Category
@@ -29,7 +34,7 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer()
 
     class Meta:
@@ -42,7 +47,7 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class ProductInfoSerializer(serializers.ModelSerializer):
+class ProductInfoSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     product = ProductSerializer()
     shop = ShopSerializer()
 
@@ -61,7 +66,45 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class ContactSerializer(serializers.ModelSerializer):
+class CatalogEntrySerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CatalogEntry
+        fields = (
+            "product_info",
+            "shop",
+            "shop_name",
+            "shop_state",
+            "category",
+            "category_name",
+            "product",
+            "product_name",
+            "model",
+            "external_id",
+            "quantity",
+            "price",
+            "price_rrc",
+            "parameters",
+        )
+        read_only_fields = fields
+
+
+class BestOfferSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = BestOffer
+        fields = (
+            "product",
+            "product_name",
+            "category",
+            "product_info",
+            "shop",
+            "shop_name",
+            "price",
+            "offer_count",
+        )
+        read_only_fields = fields
+
+
+class ContactSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
         fields = (
@@ -113,7 +156,7 @@ class ProductParameterSerialezer(serializers.Serializer):
         read_only_fields = ("id",)
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = (
@@ -126,11 +169,31 @@ class OrderItemSerializer(serializers.ModelSerializer):
         extra_kwargs = {"order": {"write_only": True}}
 
 
+class CartItemSerializer(serializers.Serializer):
+    """
+    Строка добавления в корзину; товар проверяется отдельно одним
+    запросом на все строки
+    """
+
+    product_info = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CartItemUpdateSerializer(serializers.Serializer):
+    """
+    Строка изменения количества позиции корзины; позиция проверяется
+    отдельно одним запросом на все строки
+    """
+
+    id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
 class OrderItemCreateSerializer(OrderItemSerializer):
     product_info = ProductInfoSerializer(read_only=True)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
     total_sum = serializers.IntegerField()
     contact = ContactSerializer(read_only=True)
@@ -146,3 +209,27 @@ class OrderSerializer(serializers.ModelSerializer):
             "contact",
         )
         read_only_fields = ("id",)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            "id",
+            "url",
+            "state",
+            "parsed",
+            "staged",
+            "written",
+            "errors",
+            "etag",
+            "last_modified",
+            "created_at",
+            "updated_at",
+            "started_at",
+            "finished_at",
+            "duration",
+        )
+        read_only_fields = fields
@@ -0,0 +1,141 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class Shape:
+    """
+    Форма ответа из параметров запроса fields и expand
+
+    fields - поля через запятую, вложенные через точку: id,price,product.name.
+    expand - вложенные объекты, выводимые целиком: product,product.category;
+    остальные вложенные объекты заменяются их идентификаторами. Поле из
+    fields с точкой раскрывает своего родителя. Без обоих параметров
+    ответ остается полным, как раньше.
+
+    Attributes:
+    - fields (set): пути выбранных полей, None - все поля.
+    - expand (set): пути раскрываемых объектов, None - раскрыть все.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    def includes(self, name):
+        """
+        Выводится ли поле этого уровня
+        """
+        return self.fields is None or name in _heads(self.fields)
+
+    def expands(self, name):
+        """
+        Выводится ли вложенный объект этого уровня целиком
+        """
+        if self.expand is None or name in _heads(self.expand):
+            return True
+        return self.fields is not None and any(
+            path.startswith(f"{name}.") for path in self.fields
+        )
+
+    def child(self, name):
+        """
+        Форма вложенного объекта
+        """
+        fields = None
+        if self.fields is not None:
+            fields = _tails(self.fields, name) or None
+        expand = None if self.expand is None else _tails(self.expand, name)
+        return Shape(fields, expand)
+
+    def wants(self, path, expanded=True):
+        """
+        Нужны ли данные по пути через точку, например для prefetch_related.
+
+        Args:
+        - path (str): путь к полю, например ordered_items.product_info.shop.
+        - expanded (bool): поле нужно раскрытым, а не только идентификатором.
+        """
+        shape = self
+        *parents, name = path.split(".")
+        for parent in parents:
+            if not (shape.includes(parent) and shape.expands(parent)):
+                return False
+            shape = shape.child(parent)
+        return shape.includes(name) and (not expanded or shape.expands(name))
+
+    def lookups(self, related):
+        """
+        Отбирает select_related/prefetch_related под форму ответа.
+
+        Args:
+        - related (dict): путь ORM -> путь поля сериализатора.
+
+        Returns:
+        - list: нужные пути ORM.
+        """
+        return [lookup for lookup, path in related.items() if self.wants(path)]
+
+
+def parse_shape(params):
+    """
+    Форма ответа из параметров запроса
+    """
+    fields = _split(params.get("fields"))
+    expand = _split(params.get("expand"))
+    if fields is None and expand is None:
+        return Shape()
+    return Shape(fields, expand or set())
+
+
+class ShapedSerializerMixin:
+    """
+    Сериализатор, выводящий только поля из формы ответа shape
+
+    Невыбранные поля удаляются до сериализации, а нераскрытые вложенные
+    сериализаторы заменяются идентификаторами, поэтому ни вложенные
+    объекты, ни запросы за ними не нужны.
+    """
+
+    def __init__(self, *args, shape=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if shape is None or shape.fields is None and shape.expand is None:
+            return
+        for name, field in list(self.fields.items()):
+            if not shape.includes(name):
+                self.fields.pop(name)
+                continue
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            if shape.expands(name):
+                if isinstance(nested, ShapedSerializerMixin):
+                    self.fields[name] = type(nested)(
+                        many=many, read_only=True, shape=shape.child(name)
+                    )
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=many or self._is_to_many(field.source), read_only=True
+                )
+
+    def _is_to_many(self, source):
+        try:
+            model_field = self.Meta.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return False
+        return model_field.many_to_many or model_field.one_to_many
+
+
+def _split(value):
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def _heads(paths):
+    return {path.split(".", 1)[0] for path in paths}
+
+
+def _tails(paths, name):
+    prefix = f"{name}."
+    return {path[len(prefix) :] for path in paths if path.startswith(prefix)}
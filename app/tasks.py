@@ -0,0 +1,251 @@
+from datetime import timedelta
+from functools import partial
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import pool
+from .fetch import fetch_price_list
+from .importer import import_records
+from .models import ImportJob
+from .parsers import iter_price_list
+
+_executor = None
+
+
+def get_executor():
+    """
+    Локальный пул процессов для фоновых задач.
+
+    При создании пула, то есть после запуска процесса, задачи, которые
+    дольше IMPORT_JOB_TIMEOUT не сообщали о прогрессе, отмечаются
+    неудавшимися: их очередь осталась в памяти прежнего процесса.
+    """
+    global _executor
+    if _executor is None:
+        fail_stale_jobs()
+        _executor = pool.create_pool(settings.IMPORT_WORKERS)
+    return _executor
+
+
+def submit_import(job):
+    """
+    Ставит задачу импорта в очередь после фиксации транзакции.
+
+    Args:
+    - job (ImportJob): созданная задача импорта.
+    """
+    transaction.on_commit(lambda: _submit(job.id))
+
+
+def _submit(job_id):
+    future = get_executor().submit(run_import, job_id)
+    future.add_done_callback(partial(_fail_unfinished, job_id))
+
+
+def _fail_unfinished(job_id, future):
+    """
+    Отмечает неудавшейся задачу, которую процесс пула не довел до конца.
+
+    Итог импорта и его ошибки run_import записывает сам; сюда попадают
+    ошибки до начала импорта, падение процесса пула и отмена задачи.
+    Вызывается в служебном потоке пула.
+    """
+    if future.cancelled():
+        error = "Задача импорта отменена"
+    elif future.exception() is not None:
+        error = str(future.exception()) or type(future.exception()).__name__
+    else:
+        return
+    close_old_connections()
+    try:
+        fail_jobs(ImportJob.objects.filter(id=job_id), error)
+    finally:
+        close_old_connections()
+
+
+def fail_jobs(jobs, error):
+    """
+    Отмечает неудавшимися незавершенные задачи выборки.
+
+    Args:
+    - jobs (QuerySet): задачи импорта.
+    - error (str): текст ошибки для задачи.
+
+    Returns:
+    - int: число отмеченных задач.
+    """
+    return jobs.filter(state__in=("queued", "running")).update(
+        state="failed",
+        errors=[{"Error": error}],
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def fail_stale_jobs(jobs=None):
+    """
+    Отмечает неудавшимися задачи без прогресса дольше IMPORT_JOB_TIMEOUT.
+
+    Args:
+    - jobs (QuerySet): задачи для проверки; None - все.
+
+    Returns:
+    - int: число отмеченных задач.
+    """
+    if jobs is None:
+        jobs = ImportJob.objects.all()
+    expired = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    return fail_jobs(jobs.filter(updated_at__lt=expired), "Задача импорта прервана")
+
+
+def run_import(job_id):
+    """
+    Выполняет импорт прайс-листа в процессе пула.
+
+    Пока идет разбор, в задаче обновляются число прочитанных товаров
+    и число измененных товаров, подготовленных к публикации; число
+    записанных в каталог известно после публикации.
+
+    Args:
+    - job_id (int): идентификатор ImportJob.
+    """
+    close_old_connections()
+    job = ImportJob.objects.get(id=job_id)
+    job.state = "running"
+    job.started_at = timezone.now()
+    job.save(update_fields=["state", "started_at", "updated_at"])
+
+    def progress(importer):
+        ImportJob.objects.filter(id=job.id).update(
+            parsed=importer.parsed,
+            staged=importer.staged,
+            updated_at=timezone.now(),
+        )
+
+    try:
+        if job.file:
+            importer = _import_file(job, progress)
+        else:
+            importer = _import_url(job, progress)
+    except Exception as error:
+        job.refresh_from_db(fields=["parsed", "staged", "written"])
+        job.state = "failed"
+        job.errors = [{"Error": str(error)}]
+    else:
+        if importer is None:
+            job.state = "skipped"
+        else:
+            job.state = "done"
+            job.parsed = importer.parsed
+            job.staged = importer.staged
+            job.written = importer.written
+            job.errors = importer.errors
+    if job.file:
+        job.file.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save(
+        update_fields=[
+            "file",
+            "state",
+            "parsed",
+            "staged",
+            "written",
+            "errors",
+            "updated_at",
+            "finished_at",
+        ]
+    )
+    close_old_connections()
+
+
+def _import_file(job, progress):
+    with job.file.open("rb") as file:
+        records = iter_price_list(file, filename=job.file.name)
+        return import_records(records, user=job.user, progress=progress)
+
+
+def _import_url(job, progress):
+    """
+    Импорт по ссылке; None, если прайс-лист не изменился с прошлого импорта.
+
+    Условный запрос строится по ETag и Last-Modified задачи, которая
+    опубликовала текущий каталог магазина: публикация из любого
+    источника сбрасывает их у прежних задач, поэтому они есть только
+    у последней опубликованной загрузки и только если она была
+    по этой же ссылке.
+    """
+    previous = (
+        ImportJob.objects.filter(user_id=job.user_id, url=job.url)
+        .exclude(id=job.id)
+        .exclude(etag="", last_modified="")
+        .order_by("-id")
+        .first()
+    )
+    with fetch_price_list(
+        job.url,
+        etag=previous.etag if previous else "",
+        last_modified=previous.last_modified if previous else "",
+    ) as download:
+        if download.not_modified:
+            return None
+
+        def remember_validators(importer):
+            ImportJob.objects.filter(id=job.id).update(
+                etag=download.etag, last_modified=download.last_modified
+            )
+
+        records = iter_price_list(
+            download.file,
+            content_type=download.content_type,
+            filename=urlparse(job.url).path,
+        )
+        return import_records(
+            records,
+            user=job.user,
+            progress=progress,
+            on_publish=remember_validators,
+        )
+
+
+def import_feed(source):
+    """
+    Импортирует один прайс-лист в процессе пула create_pool.
+
+    Args:
+    - source (str): ссылка на прайс-лист или путь к файлу.
+
+    Returns:
+    - dict: статистика импорта или ошибка.
+    """
+    close_old_connections()
+    try:
+        if urlparse(source).scheme in ("http", "https"):
+            with fetch_price_list(source) as download:
+                records = iter_price_list(
+                    download.file,
+                    content_type=download.content_type,
+                    filename=urlparse(source).path,
+                )
+                importer = import_records(records)
+        else:
+            with open(source, "rb") as file:
+                records = iter_price_list(file, filename=source)
+                importer = import_records(records)
+    except Exception as error:
+        return {"Status": False, "Errors": [{"Error": str(error)}]}
+    finally:
+        close_old_connections()
+
+    return {
+        "Status": True,
+        "shop": importer.shop.name,
+        "parsed": importer.parsed,
+        "created": importer.created,
+        "updated": importer.updated,
+        "unchanged": importer.unchanged,
+        "deleted": importer.deleted,
+        "Errors": importer.errors,
+    }
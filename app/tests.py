@@ -1,3 +1,1699 @@
-from django.test import TestCase
+import re
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from json import dumps
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import Mock, patch
+from uuid import uuid4
 
-# Create your tests here.
+import yaml
+from yaml.composer import ComposerError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .autocomplete import PrefixIndex
+from .cache import catalog_cache
+from .exporters import EXPORTERS
+from .facets import facet_counts
+from .fastpath import row_mapper
+from .fetch import Download, FetchError, fetch_price_list
+from .importer import (
+    MAX_BATCH_SIZE,
+    CatalogImporter,
+    ImportRejected,
+    _get_or_create_by_name,
+    import_price_list,
+    import_records,
+)
+from .models import (
+    BestOffer,
+    CatalogEntry,
+    Category,
+    Contact,
+    ImportJob,
+    Order,
+    OrderItem,
+    Parameter,
+    Product,
+    ProductInfo,
+    ProductInfoStage,
+    ProductParameter,
+    Shop,
+    User,
+)
+from .pagination import _after
+from .readmodel import (
+    rebuild_best_offers,
+    rebuild_catalog_entries,
+    refresh_best_offers,
+    refresh_catalog_entries,
+)
+from .search import InvertedIndex
+from .serializers import OrderSerializer, ProductInfoSerializer
+from .shaping import Shape
+from .parsers import get_format, iter_price_list, iter_records, iter_yaml
+from .tasks import _fail_unfinished, fail_stale_jobs, run_import, submit_import
+from .uploads import LimitedUploadHandler
+from .views import ProductInfoAPIView, order_prefetches, product_info_related
+
+
+def price_list(shop="Связной", goods=(), categories=((1, "Смартфоны"),), **header):
+    """
+    Прайс-лист в формате импорта
+    """
+    return {
+        "shop": shop,
+        **header,
+        "categories": [{"id": id, "name": name} for id, name in categories],
+        "goods": list(goods),
+    }
+
+
+def good(external_id, price=1000, quantity=5, category=1, **fields):
+    """
+    Товар прайс-листа
+    """
+    return {
+        "id": external_id,
+        "category": category,
+        "model": f"model/{external_id}",
+        "name": f"Товар {external_id}",
+        "price": price,
+        "price_rrc": price + 100,
+        "quantity": quantity,
+        "parameters": {"Цвет": "черный"},
+        **fields,
+    }
+
+
+def create_partner(email="partner@example.com"):
+    return User.objects.create_user(
+        email=email, password="password", username=email, type="shop"
+    )
+
+
+class ImportBatchTest(TestCase):
+    def setUp(self):
+        self.user = create_partner()
+
+    def import_goods(self, count, **kwargs):
+        goods = [good(external_id) for external_id in range(1, count + 1)]
+        return import_price_list(price_list(goods=goods), user=self.user, **kwargs)
+
+    def test_goods_are_written_in_batches(self):
+        batches = []
+
+        importer = self.import_goods(5, batch_size=2, progress=batches.append)
+
+        self.assertEqual(len(batches), 3)
+        self.assertEqual((importer.parsed, importer.created), (5, 5))
+        self.assertEqual(ProductInfo.objects.count(), 5)
+        self.assertEqual(ProductParameter.objects.count(), 5)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        self.import_goods(1, batch_size=100)
+        ProductInfo.objects.all().delete()
+        with CaptureQueriesContext(connection) as few:
+            self.import_goods(3, batch_size=100)
+        ProductInfo.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self.import_goods(30, batch_size=100)
+
+        self.assertEqual(len(many), len(few))
+
+    def test_invalid_goods_are_reported_and_skipped(self):
+        missing_price = good(2)
+        del missing_price["price"]
+        goods = [good(1), missing_price, good(3, quantity="много"), good(4)]
+
+        importer = import_price_list(
+            price_list(goods=goods), user=self.user, batch_size=2
+        )
+
+        self.assertEqual(
+            [error["id"] for error in importer.errors], [2, 3], importer.errors
+        )
+        self.assertEqual(
+            set(ProductInfo.objects.values_list("external_id", flat=True)), {1, 4}
+        )
+
+    def test_duplicate_ids_are_reported(self):
+        goods = [good(1), good(1, price=900), good(2), good(1, price=800)]
+
+        importer = import_price_list(
+            price_list(goods=goods), user=self.user, batch_size=3
+        )
+
+        self.assertEqual((importer.parsed, importer.written), (4, 2))
+        self.assertEqual([error["id"] for error in importer.errors], [1, 1])
+        self.assertEqual(ProductInfo.objects.get(external_id=1).price, 1000)
+
+    def test_reimport_updates_rows_in_place(self):
+        self.import_goods(2)
+        ids = set(ProductInfo.objects.values_list("id", flat=True))
+        goods = [
+            good(1, price=900, parameters={"Цвет": "белый"}),
+            good(2, parameters={"Память": "128"}),
+        ]
+
+        importer = import_price_list(price_list(goods=goods), user=self.user)
+
+        self.assertEqual(importer.updated, 2)
+        self.assertEqual(set(ProductInfo.objects.values_list("id", flat=True)), ids)
+        self.assertEqual(ProductInfo.objects.get(external_id=1).price, 900)
+        self.assertEqual(
+            set(
+                ProductParameter.objects.values_list(
+                    "product_info__external_id", "parameter__name", "value"
+                )
+            ),
+            {(1, "Цвет", "белый"), (2, "Память", "128")},
+        )
+
+
+class ImportDiffTest(TestCase):
+    def setUp(self):
+        self.user = create_partner()
+        self.goods = [good(1), good(2), good(3)]
+        import_price_list(price_list(goods=self.goods), user=self.user)
+
+    def reimport(self, goods):
+        return import_price_list(price_list(goods=goods), user=self.user)
+
+    def test_unchanged_goods_are_skipped(self):
+        with patch.object(CatalogImporter, "_stage_batch") as stage:
+            importer = self.reimport(self.goods)
+
+        stage.assert_not_called()
+        self.assertEqual((importer.unchanged, importer.written), (3, 0))
+
+    def test_only_changed_goods_are_written(self):
+        importer = self.reimport([good(1), good(2, quantity=1), good(3)])
+
+        self.assertEqual((importer.unchanged, importer.updated), (2, 1))
+        self.assertEqual(ProductInfo.objects.get(external_id=2).quantity, 1)
+
+    def test_missing_goods_are_deleted(self):
+        importer = self.reimport(self.goods[:1])
+
+        self.assertEqual(importer.deleted, 2)
+        self.assertEqual(
+            list(ProductInfo.objects.values_list("external_id", flat=True)), [1]
+        )
+
+    def test_missing_ordered_goods_are_zeroed(self):
+        ordered = ProductInfo.objects.get(external_id=2)
+        order = Order.objects.create(user=create_partner("buyer@example.com"))
+        OrderItem.objects.create(
+            order=order, product_info=ordered, shop=ordered.shop, quantity=1
+        )
+
+        importer = self.reimport(self.goods[:1])
+
+        self.assertEqual(importer.deleted, 1)
+        ordered.refresh_from_db()
+        self.assertEqual(ordered.quantity, 0)
+        self.assertFalse(ProductInfo.objects.filter(external_id=3).exists())
+
+    def test_zeroed_good_comes_back_on_reimport(self):
+        order = Order.objects.create(user=create_partner("buyer@example.com"))
+        ordered = ProductInfo.objects.get(external_id=2)
+        OrderItem.objects.create(
+            order=order, product_info=ordered, shop=ordered.shop, quantity=1
+        )
+        self.reimport(self.goods[:1])
+
+        importer = self.reimport(self.goods)
+
+        self.assertEqual(importer.updated, 1)
+        self.assertEqual(ProductInfo.objects.get(external_id=2).quantity, 5)
+
+
+CATALOG_YAML = """\
+shop: Связной
+url: https://example.com/price.yaml
+categories:
+  - id: 1
+    name: Смартфоны
+  - id: 2
+    name: Аксессуары
+goods:
+  - id: 10
+    category: 1
+    name: Телефон
+    model: apple/iphone
+    price: 1000
+    price_rrc: 1100
+    quantity: 5
+    parameters:
+      Цвет: черный
+      Память: "128"
+  - id: 11
+    category: 2
+    name: Чехол
+    model: case
+    price: 100
+    price_rrc: 120
+    quantity: 7
+    parameters:
+      Цвет: белый
+"""
+
+CATALOG_CSV = """\
+shop,url,category,category_name,id,name,model,price,price_rrc,quantity,Цвет,Память
+Связной,https://example.com/price.yaml,1,Смартфоны,10,Телефон,apple/iphone,1000,1100,5,черный,128
+Связной,https://example.com/price.yaml,2,Аксессуары,11,Чехол,case,100,120,7,белый,
+"""
+
+
+def parsed(records):
+    """
+    Шапка, категории и товары из потока пар (ключ, значение)
+    """
+    header, sections = {}, {"categories": [], "goods": []}
+    for key, value in records:
+        if key in sections:
+            sections[key].append(value)
+        else:
+            header[key] = value
+    return header, sections["categories"], sections["goods"]
+
+
+class ParserTest(TestCase):
+    def parse(self, content, filename):
+        return parsed(iter_price_list(BytesIO(content.encode()), filename=filename))
+
+    def test_formats_give_same_records(self):
+        catalog = yaml.safe_load(CATALOG_YAML)
+        expected = self.parse(CATALOG_YAML, "price.yaml")
+
+        self.assertEqual(expected[2], catalog["goods"])
+        self.assertEqual(self.parse(dumps(catalog), "price.json"), expected)
+        self.assertEqual(self.parse(CATALOG_CSV, "price.csv"), expected)
+        names = {category["id"]: category["name"] for category in catalog["categories"]}
+        lines = "".join(
+            dumps(
+                {
+                    "shop": catalog["shop"],
+                    "url": catalog["url"],
+                    "category_name": names[item["category"]],
+                    **item,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+            for item in catalog["goods"]
+        )
+        self.assertEqual(self.parse(lines, "price.jsonl"), expected)
+
+    def test_csv_parameter_columns_may_be_prefixed(self):
+        content = (
+            "shop,category,category_name,id,name,price,price_rrc,quantity,"
+            "parameter:price,parameter:Цвет\n"
+            "Связной,1,Смартфоны,10,Телефон,1000,1100,5,по запросу,черный\n"
+        )
+
+        goods = self.parse(content, "price.csv")[2]
+
+        self.assertEqual(goods[0]["price"], 1000)
+        self.assertEqual(
+            goods[0]["parameters"], {"price": "по запросу", "Цвет": "черный"}
+        )
+
+    def test_stream_composer_matches_safe_load(self):
+        content = """\
+shop: !!str 12345
+url: null
+categories: [{id: 1, name: Смартфоны}, {id: !!int "2", name: !!str 42}]
+goods:
+  - {id: 10, category: 1, name: Телефон, price: 1000, price_rrc: 1100,
+     quantity: 5, parameters: {Цвет: черный, Размеры: {ширина: 7, высота: 15}}}
+  - id: 11
+    category: 2
+    name: "Чехол: кожаный"
+    price: 1e3
+    price_rrc: 0x10
+    quantity: 7
+    parameters:
+      Поддержка: [2g, 3g, 4g]
+      Вес: 1.5
+      Есть: yes
+      Дата: 2024-01-01
+"""
+        catalog = yaml.safe_load(content)
+
+        header, categories, goods = self.parse(content, "price.yaml")
+
+        self.assertEqual(header, {"shop": "12345", "url": None})
+        self.assertEqual(categories, catalog["categories"])
+        self.assertEqual(goods, catalog["goods"])
+
+    def test_empty_sections_give_no_records(self):
+        content = "shop: Связной\ncategories:\ngoods:\n"
+
+        for records in (
+            iter_yaml(BytesIO(content.encode())),
+            iter_records(yaml.safe_load(content)),
+        ):
+            with self.subTest(records=records):
+                self.assertEqual(list(records), [("shop", "Связной")])
+
+        importer = import_records(iter_yaml(content), user=create_partner())
+        self.assertEqual((importer.parsed, importer.errors), (0, []))
+
+    def test_aliases_are_rejected(self):
+        content = "categories:\n  - &phone {id: 1, name: Смартфоны}\n  - *phone\n"
+
+        with self.assertRaises(ComposerError):
+            list(iter_yaml(content))
+
+    def test_format_is_chosen_by_content_type_then_extension(self):
+        self.assertEqual(get_format("text/csv; charset=utf-8", "price.yaml"), "csv")
+        self.assertEqual(get_format("application/x-ndjson", "price.json"), "jsonl")
+        self.assertEqual(get_format("", "PRICE.JSON"), "json")
+        self.assertEqual(get_format("application/octet-stream", "price.yml"), "yaml")
+        self.assertEqual(get_format(), "yaml")
+
+    def test_bad_csv_cells_are_kept_for_import_errors(self):
+        content = (
+            "shop,category,category_name,id,name,price,price_rrc,quantity\n"
+            "Связной,1,Смартфоны,10,Телефон,12.5, 3,5,лишняя\n"
+            "Связной,x,Смартфоны,11,Чехол,100,120,7\n"
+        )
+
+        header, categories, goods = self.parse(content, "price.csv")
+
+        self.assertEqual(categories, [{"id": 1, "name": "Смартфоны"}])
+        self.assertEqual((goods[0]["price"], goods[0]["price_rrc"]), ("12.5", 3))
+        self.assertEqual(goods[0]["parameters"], {})
+        self.assertEqual(goods[1]["category"], "x")
+
+    def test_bad_csv_cells_do_not_stop_import(self):
+        content = (
+            "shop,category,category_name,id,name,price,price_rrc,quantity\n"
+            "Связной,1,Смартфоны,10,Телефон,12.5,13,5\n"
+            "Связной,1,Смартфоны,11,Чехол,100,120,7\n"
+        )
+        user = create_partner()
+
+        importer = import_records(
+            iter_price_list(BytesIO(content.encode()), filename="price.csv"),
+            user=user,
+        )
+
+        self.assertEqual([error["id"] for error in importer.errors], [10])
+        self.assertEqual(importer.created, 1)
+
+
+class ExportRoundTripTest(TestCase):
+    categories = {1: "Смартфоны", 2: "Аксессуары"}
+
+    def setUp(self):
+        self.user = create_partner()
+        parameters = {
+            "Цвет": "черный",
+            "price": "по запросу",
+            "shop": "Эльдорадо",
+            "parameter:id": "7",
+        }
+        self.goods = [good(1, parameters=parameters), good(2, category=2)]
+        self.shop = import_price_list(
+            price_list(goods=self.goods, categories=self.categories.items()),
+            user=self.user,
+        ).shop
+
+    def export(self, file_format):
+        response = APIClient().get(
+            reverse("app:export", args=[file_format]), {"shop_id": self.shop.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def by_category_name(self, goods, categories):
+        # выгрузка выводит id категорий каталога, а не прайс-листа
+        return [{**item, "category": categories[item["category"]]} for item in goods]
+
+    def test_export_imports_back_unchanged(self):
+        for file_format in EXPORTERS:
+            with self.subTest(file_format):
+                content = self.export(file_format)
+                filename = f"catalog.{file_format}"
+
+                header, categories, goods = parsed(
+                    iter_price_list(BytesIO(content), filename=filename)
+                )
+                importer = import_records(
+                    iter_price_list(BytesIO(content), filename=filename),
+                    user=self.user,
+                )
+
+                self.assertEqual(header, {"shop": "Связной"})
+                categories = {
+                    category["id"]: category["name"] for category in categories
+                }
+                self.assertEqual(
+                    self.by_category_name(goods, categories),
+                    self.by_category_name(self.goods, self.categories),
+                )
+                self.assertEqual(importer.errors, [])
+                self.assertEqual((importer.unchanged, importer.written), (2, 0))
+
+
+class ImportShopOwnerTest(TestCase):
+    def test_first_import_links_shop_to_user(self):
+        user = create_partner()
+
+        importer = import_price_list(price_list(goods=[good(1)]), user=user)
+
+        self.assertEqual(importer.shop.user, user)
+        self.assertEqual(Shop.objects.get(user=user).name, "Связной")
+
+    def test_reimport_goes_to_users_shop(self):
+        user = create_partner()
+        shop = import_price_list(price_list(goods=[good(1)]), user=user).shop
+
+        importer = import_price_list(price_list(goods=[good(2)]), user=user)
+
+        self.assertEqual(importer.shop, shop)
+        self.assertEqual(Shop.objects.count(), 1)
+
+    def test_foreign_shop_is_rejected(self):
+        owner = create_partner()
+        import_price_list(price_list(goods=[good(1), good(2)]), user=owner)
+        intruder = create_partner("intruder@example.com")
+
+        with self.assertRaises(ImportRejected):
+            import_price_list(price_list(goods=[good(3)]), user=intruder)
+
+        self.assertEqual(ProductInfo.objects.count(), 2)
+        self.assertFalse(Shop.objects.filter(user=intruder).exists())
+
+    def test_other_shop_name_of_own_user_is_rejected(self):
+        user = create_partner()
+        import_price_list(price_list(goods=[good(1)]), user=user)
+
+        with self.assertRaises(ImportRejected):
+            import_price_list(price_list("Эльдорадо", goods=[good(2)]), user=user)
+
+        self.assertFalse(Shop.objects.filter(name="Эльдорадо").exists())
+
+
+class SharedCatalogRowsTest(TestCase):
+    def test_shops_share_categories_products_and_parameters(self):
+        import_price_list(price_list(goods=[good(1)]), user=create_partner())
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(7, name="Товар 1")]),
+            user=create_partner("other@example.com"),
+        )
+
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Parameter.objects.count(), 1)
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(ProductInfo.objects.count(), 2)
+
+    def test_rows_created_concurrently_are_reused(self):
+        existing = Parameter.objects.create(name="Цвет")
+        lookup = Parameter.objects.filter
+        calls = []
+
+        def stale_lookup(**kwargs):
+            # первое чтение не видит строку, созданную другим импортом
+            calls.append(kwargs)
+            return Parameter.objects.none() if len(calls) == 1 else lookup(**kwargs)
+
+        with patch.object(Parameter.objects, "filter", stale_lookup):
+            parameters = _get_or_create_by_name(Parameter, {"Цвет", "Память"})
+
+        self.assertEqual(parameters["Цвет"], existing)
+        self.assertEqual(Parameter.objects.count(), 2)
+
+
+class ImportStagingTest(TestCase):
+    def setUp(self):
+        self.user = create_partner()
+        self.shop = import_price_list(price_list(goods=[good(1)]), user=self.user).shop
+
+    def importer(self, *goods):
+        importer = CatalogImporter.for_shop("Связной", user=self.user)
+        importer.import_categories([{"id": 1, "name": "Смартфоны"}])
+        importer.import_goods(goods)
+        return importer
+
+    def test_staged_goods_are_invisible_until_publish(self):
+        importer = self.importer(good(1, price=900), good(2))
+
+        self.assertEqual(ProductInfo.objects.get().price, 1000)
+        self.assertEqual(ProductInfoStage.objects.count(), 2)
+
+        importer.publish()
+
+        self.assertEqual(
+            dict(ProductInfo.objects.values_list("external_id", "price")),
+            {1: 900, 2: 1000},
+        )
+        self.assertFalse(ProductInfoStage.objects.exists())
+
+    def test_publish_keeps_rows_of_concurrent_import(self):
+        importer = self.importer(good(2))
+        concurrent = self.importer(good(3))
+
+        importer.publish()
+
+        self.assertEqual(
+            set(ProductInfoStage.objects.values_list("token", flat=True)),
+            {concurrent.token},
+        )
+
+    @override_settings(IMPORT_STAGE_TTL=60)
+    def test_publish_removes_stale_rows_of_interrupted_import(self):
+        interrupted = self.importer(good(3))
+        ProductInfoStage.objects.update(
+            created_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.importer(good(2)).publish()
+
+        self.assertFalse(
+            ProductInfoStage.objects.filter(token=interrupted.token).exists()
+        )
+
+    def test_shared_products_are_locked_after_catalog_commits(self):
+        importer = self.importer(good(1, price=900), good(2))
+        depth = len(connection.atomic_blocks)
+        calls = []
+
+        def refresh(product_ids):
+            calls.append(len(connection.atomic_blocks))
+
+        with patch("app.importer.refresh_best_offers", refresh):
+            importer.publish()
+
+        self.assertEqual(calls, [depth])
+
+    def test_batch_size_is_capped(self):
+        importer = CatalogImporter(self.shop, batch_size=10**6)
+
+        self.assertEqual(importer.batch_size, MAX_BATCH_SIZE)
+
+    def test_failed_import_discards_staged_rows(self):
+        goods = [good(2), good(3)]
+
+        with patch.object(CatalogImporter, "publish", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                import_price_list(price_list(goods=goods), user=self.user, batch_size=1)
+
+        self.assertFalse(ProductInfoStage.objects.exists())
+        self.assertEqual(ProductInfo.objects.count(), 1)
+
+
+class CatalogEntryTest(TestCase):
+    def entries(self):
+        return list(
+            CatalogEntry.objects.order_by("product_info_id").values(
+                *[field.attname for field in CatalogEntry._meta.concrete_fields]
+            )
+        )
+
+    def test_import_refreshes_only_changed_entries(self):
+        user = create_partner()
+        import_price_list(
+            price_list(goods=[good(1), good(2), good(3), good(4)]), user=user
+        )
+        ordered = ProductInfo.objects.get(external_id=3)
+        OrderItem.objects.create(
+            order=Order.objects.create(user=create_partner("buyer@example.com")),
+            product_info=ordered,
+            shop=ordered.shop,
+            quantity=1,
+        )
+
+        with patch(
+            "app.importer.refresh_catalog_entries", wraps=refresh_catalog_entries
+        ) as refresh:
+            import_price_list(
+                price_list(
+                    goods=[
+                        good(1, price=900),
+                        good(2),
+                        good(5, parameters={"Цвет": "белый"}),
+                    ]
+                ),
+                user=user,
+            )
+
+        ids = dict(ProductInfo.objects.values_list("external_id", "id"))
+        refreshed = [pk for call in refresh.call_args_list for pk in call.args[0]]
+        self.assertCountEqual(refreshed, [ids[1], ids[3], ids[5]])
+        entries = {entry["external_id"]: entry for entry in self.entries()}
+        self.assertEqual(sorted(entries), [1, 2, 3, 5])
+        self.assertEqual(entries[1]["price"], 900)
+        self.assertEqual(entries[3]["quantity"], 0)
+        self.assertEqual(entries[5]["parameters"], {"Цвет": "белый"})
+
+        incremental = self.entries()
+        rebuild_catalog_entries()
+        self.assertEqual(self.entries(), incremental)
+
+
+class BestOfferTest(TestCase):
+    def test_best_offer_follows_publishes_of_both_shops(self):
+        cheap = create_partner()
+        import_price_list(price_list(goods=[good(1, price=900)]), user=cheap)
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1, price=1000)]),
+            user=create_partner("other@example.com"),
+        )
+        offer = BestOffer.objects.get()
+        self.assertEqual((offer.price, offer.offer_count), (900, 2))
+
+        import_price_list(price_list(goods=[]), user=cheap)
+
+        offer = BestOffer.objects.get()
+        self.assertEqual((offer.shop_name, offer.price), ("Эльдорадо", 1000))
+        self.assertEqual(offer.offer_count, 1)
+
+    def test_import_recalculates_only_touched_products(self):
+        user = create_partner()
+        import_price_list(
+            price_list(goods=[good(1), good(2), good(3, quantity=0)]), user=user
+        )
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1, price=950), good(2)]),
+            user=create_partner("other@example.com"),
+        )
+
+        with patch(
+            "app.importer.refresh_best_offers", wraps=refresh_best_offers
+        ) as refresh:
+            import_price_list(
+                price_list(goods=[good(1, price=900), good(2), good(3)]), user=user
+            )
+
+        products = dict(Product.objects.values_list("name", "id"))
+        refreshed = [pk for call in refresh.call_args_list for pk in call.args[0]]
+        self.assertCountEqual(refreshed, [products["Товар 1"], products["Товар 3"]])
+        offers = {
+            offer.product.name: (offer.shop_name, offer.price, offer.offer_count)
+            for offer in BestOffer.objects.select_related("product")
+        }
+        self.assertEqual(
+            offers,
+            {
+                "Товар 1": ("Связной", 900, 2),
+                "Товар 2": ("Связной", 1000, 2),
+                "Товар 3": ("Связной", 1000, 1),
+            },
+        )
+
+        incremental = list(BestOffer.objects.order_by("product_id").values())
+        rebuild_best_offers()
+        self.assertEqual(
+            list(BestOffer.objects.order_by("product_id").values()), incremental
+        )
+
+
+class CatalogCacheTest(TestCase):
+    def test_shop_listing_shows_shop_linked_to_its_category_later(self):
+        shop = import_price_list(
+            price_list(goods=[good(1)]), user=create_partner()
+        ).shop
+        url = reverse("app:product-list")
+        client = APIClient()
+        first = client.get(url, {"shop_id": shop.id})
+
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1)]),
+            user=create_partner("other@example.com"),
+        )
+        second = client.get(url, {"shop_id": shop.id}, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(
+            {
+                item["name"]
+                for item in second.data["results"][0]["product"]["category"]["shop"]
+            },
+            {"Связной", "Эльдорадо"},
+        )
+
+
+class DirectoryListingTest(TestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        self.addCleanup(catalog_cache().clear)
+        categories = [(id, f"Категория {id}") for id in range(1, 6)]
+        for number, name in enumerate(("Связной", "Эльдорадо", "DNS")):
+            import_price_list(
+                price_list(
+                    name,
+                    goods=[good(id, category=id) for id in range(1, 6)],
+                    categories=categories,
+                ),
+                user=create_partner(f"partner{number}@example.com"),
+            )
+        self.client = APIClient()
+
+    def test_category_listing_takes_two_queries(self):
+        url = reverse("app:categories")
+        # версию каталога читает декоратор кэша, сам список - страница
+        # категорий и магазины всех категорий страницы
+        with patch("app.cache.get_catalog_version", return_value="1"):
+            with self.assertNumQueries(2):
+                first = self.client.get(url, {"page_size": 3}).json()
+            with self.assertNumQueries(2):
+                second = self.client.get(first["next"]).json()
+
+        results = first["results"] + second["results"]
+        self.assertEqual(len(results), 5)
+        for category in results:
+            self.assertEqual(
+                [shop["name"] for shop in category["shop"]],
+                ["Связной", "Эльдорадо", "DNS"],
+            )
+        # повторный запрос отдается из кэша
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_shop_listing_takes_two_queries(self):
+        url = reverse("app:shops")
+        # версия каталога и страница магазинов
+        with self.assertNumQueries(2):
+            first = self.client.get(url, {"page_size": 2}).json()
+        with self.assertNumQueries(2):
+            second = self.client.get(first["next"]).json()
+
+        self.assertEqual(
+            [shop["name"] for shop in first["results"] + second["results"]],
+            ["Связной", "Эльдорадо", "DNS"],
+        )
+
+
+class CatalogETagTest(TestCase):
+    def setUp(self):
+        self.partner = create_partner()
+        self.shop = import_price_list(
+            price_list(goods=[good(1)]), user=self.partner
+        ).shop
+        self.other = create_partner("other@example.com")
+        import_price_list(price_list("Эльдорадо", goods=[good(1)]), user=self.other)
+        self.client = APIClient()
+        self.urls = {
+            "shops": (reverse("app:shops"), {}),
+            "categories": (reverse("app:categories"), {}),
+            "productlist": (reverse("app:product-list"), {}),
+            "productlist shop": (
+                reverse("app:product-list"),
+                {"shop_id": self.shop.id},
+            ),
+        }
+
+    def etags(self):
+        return {
+            name: self.client.get(url, params)["ETag"]
+            for name, (url, params) in self.urls.items()
+        }
+
+    def test_matching_etag_is_answered_without_catalog_queries(self):
+        for name, etag in self.etags().items():
+            url, params = self.urls[name]
+            with self.subTest(name):
+                # остается только чтение версии каталога
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(len(queries), 1)
+                self.assertIn('"app_shop"', queries[0]["sql"])
+
+    def test_etag_changes_after_import(self):
+        before = self.etags()
+
+        import_price_list(price_list(goods=[good(1), good(2)]), user=self.partner)
+
+        after = self.etags()
+        for name in self.urls:
+            with self.subTest(name):
+                self.assertNotEqual(before[name], after[name])
+
+    def test_etag_changes_after_shop_state_toggle(self):
+        before = self.etags()
+        client = APIClient()
+        client.force_authenticate(self.partner)
+
+        client.post(reverse("app:partner-state"), {"state": "off"})
+
+        after = self.etags()
+        for name in self.urls:
+            with self.subTest(name):
+                self.assertNotEqual(before[name], after[name])
+
+    def test_shop_etag_ignores_other_shops(self):
+        url = reverse("app:catalog")
+        category = Category.objects.get()
+        scoped = {
+            "productlist": (reverse("app:product-list"), {"shop_id": self.shop.id}),
+            "catalog": (url, {"shop_id": self.shop.id, "category_id": category.id}),
+        }
+        before = {
+            name: self.client.get(url, params)["ETag"]
+            for name, (url, params) in scoped.items()
+        }
+        everything = self.client.get(reverse("app:product-list"))["ETag"]
+
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1), good(2)]), user=self.other
+        )
+
+        for name, (url, params) in scoped.items():
+            with self.subTest(name):
+                response = self.client.get(url, params, HTTP_IF_NONE_MATCH=before[name])
+                self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            reverse("app:product-list"), HTTP_IF_NONE_MATCH=everything
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_filter_makes_productlist_etag_global(self):
+        params = {"shop_id": self.shop.id, "category_id": Category.objects.get().id}
+        url = reverse("app:product-list")
+        etag = self.client.get(url, params)["ETag"]
+
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1), good(2)]), user=self.other
+        )
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class FacetTest(TestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        self.addCleanup(catalog_cache().clear)
+        self.user = create_partner()
+        self.import_goods(
+            good(1, parameters={"Цвет": "черный", "Память": "128"}),
+            good(2, parameters={"Цвет": "белый", "Память": "128"}),
+            good(3, parameters={"Цвет": "черный", "Память": "256"}),
+        )
+
+    def import_goods(self, *goods):
+        import_price_list(price_list(goods=goods), user=self.user)
+
+    def facets(self, *filters):
+        url = reverse("app:product-facets")
+        return self.client.get(url, {"parameter": filters}).json()["facets"]
+
+    def test_filters_of_different_parameters_are_combined_with_and(self):
+        ids = productlist(parameter=["Цвет:черный", "Память:128"]).values_list(
+            "external_id", flat=True
+        )
+        self.assertEqual(list(ids), [1])
+
+        ids = productlist(parameter=["Цвет:черный", "Цвет:белый", "Память:128"])
+        self.assertEqual(list(ids.values_list("external_id", flat=True)), [1, 2])
+
+        self.assertFalse(productlist(parameter=["Цвет:черный", "Вес:1"]).exists())
+
+    def test_counts_follow_filters(self):
+        self.assertEqual(
+            self.facets(),
+            {
+                "Память": [
+                    {"value": "128", "count": 2},
+                    {"value": "256", "count": 1},
+                ],
+                "Цвет": [
+                    {"value": "черный", "count": 2},
+                    {"value": "белый", "count": 1},
+                ],
+            },
+        )
+        self.assertEqual(
+            self.facets("Цвет:черный"),
+            {
+                "Память": [
+                    {"value": "128", "count": 1},
+                    {"value": "256", "count": 1},
+                ],
+                "Цвет": [{"value": "черный", "count": 2}],
+            },
+        )
+        self.assertEqual(
+            self.facets("Цвет:черный", "Память:256"),
+            {
+                "Память": [{"value": "256", "count": 1}],
+                "Цвет": [{"value": "черный", "count": 1}],
+            },
+        )
+
+    def test_counts_are_cached_by_catalog_version(self):
+        queryset = productlist(parameter=["Цвет:черный"])
+        expected = facet_counts(queryset)
+
+        # остаются чтение версии каталога и фильтр по характеристикам
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                facet_counts(productlist(parameter=["Цвет:черный"])), expected
+            )
+
+        self.import_goods(
+            good(1, parameters={"Цвет": "черный", "Память": "128"}),
+            good(4, parameters={"Цвет": "черный", "Память": "512"}),
+        )
+        self.assertEqual(
+            facet_counts(productlist(parameter=["Цвет:черный"]))["Память"],
+            [{"value": "128", "count": 1}, {"value": "512", "count": 1}],
+        )
+
+
+class FastPathTest(TestCase):
+    """
+    RowMapper выводит то же, что и сериализатор, без создания моделей
+    """
+
+    shapes = {
+        "full": Shape(),
+        "sparse": Shape({"id", "price", "shop", "product.name"}, set()),
+    }
+    order_shapes = {
+        "full": Shape(),
+        "sparse": Shape(
+            {"id", "total_sum", "ordered_items.quantity", "ordered_items.product_info"},
+            set(),
+        ),
+    }
+
+    def setUp(self):
+        self.partner = create_partner()
+        import_price_list(price_list(goods=[good(1), good(2)]), user=self.partner)
+        import_price_list(
+            price_list("Эльдорадо", goods=[good(1)]),
+            user=create_partner("other@example.com"),
+        )
+        self.buyer = create_partner("buyer@example.com")
+        contact = Contact.objects.create(
+            user=self.buyer, city="Москва", street="Тверская", phone="+79990000000"
+        )
+        order = Order.objects.create(user=self.buyer, state="new", contact=contact)
+        for product_info in ProductInfo.objects.all():
+            OrderItem.objects.create(
+                order=order,
+                product_info=product_info,
+                shop=product_info.shop,
+                quantity=2,
+            )
+
+    def orders(self):
+        return Order.objects.annotate(
+            total_sum=Sum(
+                F("ordered_items__quantity") * F("ordered_items__product_info__price")
+            )
+        ).order_by("id")
+
+    def test_product_rows_match_serializer(self):
+        queryset = ProductInfo.objects.order_by("id")
+        for name, shape in self.shapes.items():
+            with self.subTest(name):
+                mapper = row_mapper(ProductInfoSerializer, shape)
+                serializer = ProductInfoSerializer(
+                    product_info_related(queryset, shape), many=True, shape=shape
+                )
+
+                rows = mapper.map(list(mapper.values(queryset)))
+
+                self.assertEqual(rows, serializer.data)
+
+    def test_order_rows_match_serializer(self):
+        for name, shape in self.order_shapes.items():
+            with self.subTest(name):
+                mapper = row_mapper(OrderSerializer, shape)
+                serializer = OrderSerializer(
+                    self.orders()
+                    .prefetch_related(*order_prefetches(shape))
+                    .select_related(*shape.lookups({"contact": "contact"})),
+                    many=True,
+                    shape=shape,
+                )
+
+                rows = mapper.map(list(mapper.values(self.orders())))
+
+                self.assertEqual(rows, serializer.data)
+
+    def test_sparse_shape_skips_related_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        url = reverse("app:product-list")
+        # версия каталога, страница товаров и магазины категорий
+        with self.assertNumQueries(3):
+            client.get(url)
+        with self.assertNumQueries(2):
+            client.get(url, {"fields": "id,price,product.name"})
+        with self.assertNumQueries(2):
+            client.get(url, {"expand": ""})
+
+        url = reverse("app:order")
+        # заказы, позиции, товары позиций и их связи, магазины категорий
+        with self.assertNumQueries(7):
+            client.get(url)
+        with self.assertNumQueries(1):
+            client.get(url, {"fields": "id,state,total_sum"})
+        with self.assertNumQueries(2):
+            client.get(url, {"expand": ""})
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        # индекс в памяти живет дольше тестовой базы
+        self.enterContext(patch("app.search._index", InvertedIndex()))
+        catalog_cache().clear()
+        self.addCleanup(catalog_cache().clear)
+        self.user = create_partner()
+        self.goods = [
+            good(1, name="Телефон"),
+            good(2, name="Телефон с большим экраном и стилусом"),
+            good(3, name="Чехол"),
+        ]
+        import_price_list(price_list(goods=self.goods), user=self.user)
+
+    def search(self, query):
+        response = APIClient().get(reverse("app:search"), {"q": query})
+        return [item["external_id"] for item in response.json()["results"]]
+
+    def test_shorter_match_ranks_first(self):
+        self.assertEqual(self.search("телефон"), [1, 2])
+        self.assertEqual(self.search("ТЕЛЕФОН стилусом"), [2])
+        self.assertEqual(self.search("телефон планшет"), [])
+
+    def test_in_memory_index_ranks_by_bm25(self):
+        index = InvertedIndex()
+        index.refresh()
+        ids = dict(ProductInfo.objects.values_list("id", "external_id"))
+
+        self.assertEqual([ids[pk] for pk in index.search("Телефон")], [1, 2])
+        self.assertEqual([ids[pk] for pk in index.search("черный")], [1, 3, 2])
+        self.assertEqual(index.search("телефон планшет"), [])
+        self.assertEqual(index.search("  "), [])
+
+    def test_imported_good_is_found(self):
+        self.assertEqual(self.search("планшет"), [])
+
+        import_price_list(
+            price_list(goods=[*self.goods, good(4, name="Планшет")]), user=self.user
+        )
+
+        self.assertEqual(self.search("планшет"), [4])
+
+    def test_in_memory_index_rereads_only_changed_shops(self):
+        index = InvertedIndex()
+        index.refresh()
+        import_price_list(
+            price_list(
+                "Эльдорадо",
+                goods=[good(1, name="Телефон", category=5)],
+                categories=((5, "Телефоны"),),
+            ),
+            user=create_partner("other@example.com"),
+        )
+
+        # версии магазинов и товары одного нового магазина
+        with self.assertNumQueries(2):
+            index.refresh()
+        self.assertEqual(len(index.search("телефон")), 3)
+
+
+class PriceListHandler(BaseHTTPRequestHandler):
+    """
+    Сервер поставщика для тестов загрузки по ссылке
+    """
+
+    body = b"shop: Svyaznoy\n"
+
+    def do_GET(self):
+        if self.path == "/price.yaml":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Type", "application/yaml")
+            self.send_header("Content-Length", str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+        elif self.path == "/declared-large.yaml":
+            self.send_response(200)
+            self.send_header("Content-Length", "4096")
+            self.end_headers()
+            self.wfile.write(b"#" * 4096)
+        elif self.path == "/streamed-large.yaml":
+            # без Content-Length размер известен только по ходу чтения
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"#" * 4096)
+        elif self.path == "/slow.yaml":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"#" * 64 * 1024)
+            self.wfile.flush()
+            time.sleep(0.5)
+            self.wfile.write(b"#" * 64 * 1024)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(IMPORT_MAX_SIZE=256 * 1024)
+class FetchPriceListTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), PriceListHandler)
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def test_price_list_is_downloaded_with_etag(self):
+        with fetch_price_list(self.url("/price.yaml")) as download:
+            self.assertFalse(download.not_modified)
+            self.assertEqual(download.file.read(), PriceListHandler.body)
+            self.assertEqual(download.etag, '"v1"')
+            self.assertEqual(download.content_type, "application/yaml")
+
+    def test_unchanged_price_list_is_not_downloaded(self):
+        with fetch_price_list(self.url("/price.yaml"), etag='"v1"') as download:
+            self.assertTrue(download.not_modified)
+            self.assertIsNone(download.file)
+            self.assertEqual(download.etag, '"v1"')
+
+    @override_settings(IMPORT_MAX_SIZE=1024)
+    def test_declared_size_over_limit_is_rejected(self):
+        with self.assertRaisesMessage(FetchError, "размер"):
+            with fetch_price_list(self.url("/declared-large.yaml")):
+                pass
+
+    @override_settings(IMPORT_MAX_SIZE=1024)
+    def test_streamed_size_over_limit_is_rejected(self):
+        with self.assertRaisesMessage(FetchError, "размер"):
+            with fetch_price_list(self.url("/streamed-large.yaml")):
+                pass
+
+    @override_settings(IMPORT_FETCH_DEADLINE=0.2)
+    def test_download_over_deadline_is_rejected(self):
+        with self.assertRaisesMessage(FetchError, "время"):
+            with fetch_price_list(self.url("/slow.yaml")):
+                pass
+
+    def test_error_status_is_rejected(self):
+        with self.assertRaisesMessage(FetchError, "404"):
+            with fetch_price_list(self.url("/missing.yaml")):
+                pass
+
+
+class CartUpdateTest(TestCase):
+    def setUp(self):
+        import_price_list(price_list(goods=[good(1), good(2)]), user=create_partner())
+        buyer = create_partner("buyer@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(buyer)
+        basket = Order.objects.create(user=buyer, state="basket")
+        self.items = [
+            OrderItem.objects.create(
+                order=basket,
+                product_info=product_info,
+                shop=product_info.shop,
+                quantity=1,
+            )
+            for product_info in ProductInfo.objects.order_by("external_id")
+        ]
+
+    def put(self, items, format="json"):
+        return self.client.put(reverse("app:cart"), {"items": items}, format=format)
+
+    def quantities(self):
+        return list(OrderItem.objects.order_by("id").values_list("quantity", flat=True))
+
+    def test_json_list_updates_quantities(self):
+        first, second = self.items
+
+        response = self.put(
+            [{"id": first.id, "quantity": 3}, {"id": second.id, "quantity": 2}]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"Status": True, "Обновлено объектов": 2, "total_sum": 5000},
+        )
+        self.assertEqual(self.quantities(), [3, 2])
+
+    def test_form_string_updates_quantities(self):
+        items = dumps([{"id": self.items[0].id, "quantity": 4}])
+
+        response = self.put(items, format="multipart")
+
+        self.assertTrue(response.json()["Status"])
+        self.assertEqual(self.quantities(), [4, 1])
+
+    def test_bad_lines_are_reported_per_line(self):
+        response = self.put(
+            [
+                {"id": self.items[0].id, "quantity": 3},
+                {"id": self.items[1].id, "quantity": 0},
+                {"quantity": 1},
+            ]
+        )
+
+        errors = response.json()["Errors"]
+        self.assertFalse(response.json()["Status"])
+        self.assertEqual(errors[0], {})
+        self.assertIn("quantity", errors[1])
+        self.assertIn("id", errors[2])
+        self.assertEqual(self.quantities(), [1, 1])
+
+    def test_foreign_position_is_reported(self):
+        response = self.put(
+            [{"id": self.items[0].id, "quantity": 2}, {"id": 404, "quantity": 1}]
+        )
+
+        self.assertEqual(
+            response.json()["Errors"],
+            [{}, {"id": ["Позиция не найдена в корзине"]}],
+        )
+        self.assertEqual(self.quantities(), [1, 1])
+
+
+class CartAddTest(TestCase):
+    def setUp(self):
+        goods = [good(external_id) for external_id in range(1, 7)]
+        import_price_list(price_list(goods=goods), user=create_partner())
+        self.buyer = create_partner("buyer@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        self.products = list(
+            ProductInfo.objects.order_by("external_id").values_list("id", flat=True)
+        )
+
+    def post(self, items):
+        return self.client.post(reverse("app:cart"), {"items": items}, format="json")
+
+    def basket(self):
+        return list(
+            OrderItem.objects.filter(
+                order__user=self.buyer, order__state="basket"
+            ).values_list("product_info_id", "quantity")
+        )
+
+    def test_lines_are_added_in_one_call(self):
+        first, second = self.products[:2]
+
+        response = self.post(
+            [
+                {"product_info": first, "quantity": 2},
+                {"product_info": second, "quantity": 1},
+            ]
+        )
+
+        self.assertEqual(response.json(), {"Status": True, "Создано объектов": 2})
+        self.assertCountEqual(self.basket(), [(first, 2), (second, 1)])
+
+    def test_added_again_line_updates_quantity(self):
+        first = self.products[0]
+        self.post([{"product_info": first, "quantity": 2}])
+
+        response = self.post([{"product_info": first, "quantity": 5}])
+
+        self.assertTrue(response.json()["Status"])
+        self.assertEqual(self.basket(), [(first, 5)])
+
+    def test_unavailable_product_is_reported_per_line(self):
+        first, second = self.products[:2]
+        Shop.objects.update(state=False)
+
+        response = self.post(
+            [
+                {"product_info": 404, "quantity": 1},
+                {"product_info": first, "quantity": 1},
+            ]
+        )
+
+        error = {"product_info": ["Товар не найден или магазин не принимает заказы"]}
+        self.assertEqual(response.json(), {"Status": False, "Errors": [error, error]})
+        Shop.objects.update(state=True)
+        response = self.post(
+            [
+                {"product_info": first, "quantity": 1},
+                {"product_info": 404, "quantity": 1},
+            ]
+        )
+        self.assertEqual(response.json()["Errors"], [{}, error])
+        self.assertEqual(self.basket(), [])
+        self.assertFalse(Order.objects.filter(user=self.buyer).exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # первый вызов еще и создает корзину
+        self.post([{"product_info": self.products[0], "quantity": 1}])
+        counts = []
+        for products in (self.products[1:2], self.products[2:]):
+            with CaptureQueriesContext(connection) as queries:
+                self.post(
+                    [
+                        {"product_info": product_info, "quantity": 1}
+                        for product_info in products
+                    ]
+                )
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(len(self.basket()), 6)
+
+
+# Признаки полного чтения таблицы в плане запроса по СУБД
+FULL_SCANS = {
+    "sqlite": re.compile(r"\bSCAN (?!.*\bUSING\b)(\w+)"),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+}
+
+
+def productlist(**params):
+    request = Request(RequestFactory().get("/", params))
+    return ProductInfoAPIView().get_queryset(request).order_by("id")
+
+
+class QueryPlanTest(TestCase):
+    """
+    Запросы горячих путей читают таблицы по индексам, а не целиком
+    """
+
+    queries = {
+        "cart": lambda: Order.objects.filter(user_id=1, state="basket"),
+        "cart items": lambda: OrderItem.objects.filter(order_id=1),
+        "orders": lambda: Order.objects.filter(user_id=1).exclude(state="basket"),
+        "productlist shop": lambda: productlist(shop_id=1),
+        "productlist category": lambda: productlist(category_id=1),
+        "productlist by price": lambda: ProductInfo.objects.filter(
+            _after(ProductInfo, ("price", "id"), [100, 5])
+        ).order_by("price", "id")[:100],
+        "import product info": lambda: ProductInfo.objects.filter(
+            shop_id=1, external_id__in=[1, 2, 3]
+        ),
+        "import products": lambda: Product.objects.filter(
+            name__in=["a", "b"], category_id__in=[1, 2]
+        ),
+        "import parameters": lambda: Parameter.objects.filter(name__in=["a", "b"]),
+        "import categories": lambda: Category.objects.filter(name__in=["a", "b"]),
+        "import stage": lambda: ProductInfoStage.objects.filter(token=uuid4()).order_by(
+            "id"
+        ),
+    }
+
+    def setUp(self):
+        if connection.vendor not in FULL_SCANS:
+            self.skipTest(f"Планы {connection.vendor} не поддерживаются")
+        if connection.vendor == "postgresql":
+            # на маленькой базе планировщик выбирает полное чтение
+            # даже при наличии индекса
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def test_hot_queries_use_indexes(self):
+        full_scan = FULL_SCANS[connection.vendor]
+        for name, query in self.queries.items():
+            with self.subTest(name):
+                plan = query().explain()
+                self.assertEqual(full_scan.findall(plan), [], plan)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        prices = [100, 100, 100, 100, 100, 200, 200]
+        goods = [good(index, price=price) for index, price in enumerate(prices, 1)]
+        import_price_list(price_list(goods=goods), user=create_partner())
+        self.client = APIClient()
+
+    def walk(self, url, link="next"):
+        pages = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                data = self.client.get(url).data
+                pages.append([item["id"] for item in data["results"]])
+                url = data[link]
+        return pages, [query["sql"] for query in queries]
+
+    def test_tied_prices_are_paged_by_price_and_id(self):
+        expected = list(
+            ProductInfo.objects.order_by("price", "id").values_list("id", flat=True)
+        )
+        url = reverse("app:product-list") + "?ordering=price&page_size=2"
+
+        pages, queries = self.walk(url)
+
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertFalse([sql for sql in queries if "OFFSET" in sql.upper()])
+
+    def test_previous_links_walk_back(self):
+        expected = list(
+            ProductInfo.objects.order_by("-price", "-id").values_list("id", flat=True)
+        )
+        url = reverse("app:product-list") + "?ordering=-price&page_size=3"
+        last = self.client.get(url)
+        while last.data["next"]:
+            last = self.client.get(last.data["next"])
+
+        pages, _ = self.walk(last.data["previous"], link="previous")
+
+        self.assertEqual(sum(reversed(pages), []), expected[:-1])
+
+    def test_malformed_cursor_is_rejected(self):
+        url = reverse("app:product-list")
+
+        response = self.client.get(url, {"ordering": "price", "cursor": "bz01"})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        self.user = create_partner()
+        self.goods = [good(1, name="Смартфон  Белый"), good(2, name="Чехол черный")]
+        import_price_list(price_list(goods=self.goods), user=self.user)
+        self.index = PrefixIndex()
+        self.index.refresh()
+
+    def names(self, prefix):
+        return [item["name"] for item in self.index.lookup(prefix)]
+
+    def test_prefix_matches_any_word_after_normalization(self):
+        self.assertEqual(self.names("  БЕЛ"), ["Смартфон  Белый"])
+        self.assertEqual(self.names("смарт"), ["Смартфон  Белый", "Смартфоны"])
+        self.assertEqual(self.names("чехол ЧЕР"), ["Чехол черный"])
+        self.assertEqual(self.names("!!"), [])
+
+    def test_new_product_appears_after_import_without_blocking(self):
+        goods = self.goods + [good(3, name="Белая зарядка")]
+        import_price_list(price_list(goods=goods), user=self.user)
+
+        with patch("app.autocomplete.threading.Thread") as thread:
+            self.index.refresh()
+
+        # запрос не ждет перестройки и получает прежний индекс
+        thread.return_value.start.assert_called_once()
+        self.assertEqual(self.names("бел"), ["Смартфон  Белый"])
+
+        self.index._build(*thread.call_args.kwargs["args"])
+
+        self.assertEqual(self.names("бел"), ["Белая зарядка", "Смартфон  Белый"])
+
+
+@override_settings(IMPORT_BATCH_SIZE=1)
+class ImportJobTest(TestCase):
+    def setUp(self):
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = create_partner()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_job(self, content):
+        file = SimpleUploadedFile("price.json", content.encode())
+        return ImportJob.objects.create(user=self.user, file=file)
+
+    def status(self, job):
+        url = reverse("app:partner-update-status", args=[job.id])
+        return self.client.get(url).json()
+
+    def test_job_runs_to_done_and_reports_progress(self):
+        goods = [good(1), good(2), good(3)]
+        job = self.create_job(dumps(price_list(goods=goods)))
+        self.assertEqual(self.status(job)["state"], "queued")
+        progress = []
+        publish = CatalogImporter.publish
+
+        def watch_publish(importer):
+            progress.append(
+                ImportJob.objects.values("state", "parsed", "staged", "written").get()
+            )
+            publish(importer)
+
+        with patch.object(CatalogImporter, "publish", watch_publish):
+            run_import(job.id)
+
+        self.assertEqual(
+            progress,
+            [{"state": "running", "parsed": 3, "staged": 3, "written": 0}],
+        )
+        data = self.status(job)
+        self.assertEqual(data["state"], "done")
+        self.assertEqual((data["parsed"], data["staged"], data["written"]), (3, 3, 3))
+        self.assertIsNotNone(data["finished_at"])
+
+    def test_failed_import_marks_job_failed(self):
+        job = self.create_job("{not json")
+
+        run_import(job.id)
+
+        data = self.status(job)
+        self.assertEqual(data["state"], "failed")
+        self.assertEqual(len(data["errors"]), 1)
+
+    def test_submitted_job_is_watched_by_done_callback(self):
+        job = self.create_job(dumps(price_list()))
+        executor = Mock()
+
+        with patch("app.tasks.get_executor", return_value=executor):
+            with self.captureOnCommitCallbacks(execute=True):
+                submit_import(job)
+
+        executor.submit.assert_called_once_with(run_import, job.id)
+        future = Future()
+        future.set_exception(BrokenProcessPool("процесс пула завершился"))
+        callback = executor.submit.return_value.add_done_callback.call_args.args[0]
+        callback(future)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.errors, [{"Error": "процесс пула завершился"}])
+
+    def test_finished_job_is_not_touched_by_done_callback(self):
+        job = self.create_job(dumps(price_list()))
+        run_import(job.id)
+        future = Future()
+        future.set_result(None)
+
+        _fail_unfinished(job.id, future)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, "done")
+
+    def run_url_import(self, url, etag='"v1"'):
+        job = ImportJob.objects.create(user=self.user, url=url)
+        body = BytesIO(dumps(price_list(goods=[good(1)])).encode())
+        fetch = Mock(
+            return_value=nullcontext(
+                Download(file=body, etag=etag, content_type="application/json")
+            )
+        )
+        with patch("app.tasks.fetch_price_list", fetch):
+            run_import(job.id)
+        job.refresh_from_db()
+        return job, fetch.call_args.kwargs
+
+    def test_url_import_is_conditional_on_last_publication(self):
+        url = "http://example.com/price.json"
+        first, _ = self.run_url_import(url)
+        self.assertEqual((first.state, first.etag), ("done", '"v1"'))
+
+        _, conditions = self.run_url_import(url, etag='"v2"')
+
+        self.assertEqual(conditions, {"etag": '"v1"', "last_modified": ""})
+
+    def test_other_import_drops_url_validators(self):
+        url = "http://example.com/price.json"
+        first, _ = self.run_url_import(url)
+        job = self.create_job(dumps(price_list(goods=[good(2)])))
+        run_import(job.id)
+
+        _, conditions = self.run_url_import(url)
+
+        first.refresh_from_db()
+        self.assertEqual(first.etag, "")
+        self.assertEqual(conditions, {"etag": "", "last_modified": ""})
+
+    def test_other_url_import_drops_url_validators(self):
+        self.run_url_import("http://example.com/price.json")
+        self.run_url_import("http://example.com/other.json", etag='"other"')
+
+        _, conditions = self.run_url_import("http://example.com/price.json")
+
+        self.assertEqual(conditions, {"etag": "", "last_modified": ""})
+
+    @override_settings(IMPORT_JOB_TIMEOUT=60)
+    def test_stale_jobs_are_failed(self):
+        stale = self.create_job(dumps(price_list()))
+        fresh = self.create_job(dumps(price_list()))
+        ImportJob.objects.filter(id=stale.id).update(
+            state="running", updated_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(self.status(stale)["state"], "failed")
+        self.assertEqual(fail_stale_jobs(), 0)
+        self.assertEqual(self.status(fresh)["state"], "queued")
+
+
+class PartnerUploadLimitTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_partner())
+
+    def upload(self, size):
+        file = SimpleUploadedFile("price.yaml", b"#" * size)
+        return self.client.post(reverse("app:partner-upload"), {"file": file})
+
+    @override_settings(IMPORT_MAX_SIZE=4096)
+    def test_upload_within_limit_is_queued(self):
+        with patch("app.views.submit_import") as submit:
+            response = self.upload(1024)
+
+        self.assertEqual(response.status_code, 202)
+        submit.assert_called_once()
+        ImportJob.objects.get().file.delete()
+
+    @override_settings(IMPORT_MAX_SIZE=4096)
+    def test_oversized_upload_is_rejected_before_reading(self):
+        with patch("app.views.submit_import") as submit:
+            response = self.upload(8192)
+
+        self.assertEqual(response.status_code, 413)
+        submit.assert_not_called()
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_upload_is_stopped_once_limit_is_exceeded(self):
+        handler = LimitedUploadHandler(max_size=100)
+        handler.new_file("file", "price.yaml", "application/yaml", None)
+        handler.receive_data_chunk(b"#" * 60, 0)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b"#" * 60, 60)
+        self.assertTrue(handler.too_large)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Сохраняет загружаемый файл на диск частями, не больше max_size байт
+
+    Запрос с Content-Length больше предела не читается вовсе, а
+    загрузка, превысившая предел по ходу чтения, прерывается, и
+    недописанный временный файл удаляется, поэтому диск не заполняется
+    телом слишком большого запроса.
+
+    Attributes:
+    - max_size (int): предел размера в байтах.
+    - too_large (bool): загрузка отклонена из-за размера.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.IMPORT_MAX_SIZE
+        self.received = 0
+        self.too_large = False
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > self.max_size:
+            self.too_large = True
+            # разбор заканчивается сразу: без полей и файлов
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return super().handle_raw_input(
+            input_data, META, content_length, boundary, encoding
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
@@ -1,6 +1,6 @@
 from django.urls import path
 from django_rest_passwordreset.views import reset_password_request_token, reset_password_confirm
-from .views import CartAPIView, ConfirmAccount, ContactAPIView, OrderView, PartnerOrders, PartnerState, PartnerUpdate, ProductInfoAPIView, RegisterAccount, LoginAccount, ShopListAPIView, CategoryListAPIView
+from .views import AutocompleteAPIView, BestOfferAPIView, CartAPIView, CatalogAPIView, ConfirmAccount, ContactAPIView, ExportAPIView, OrderView, PartnerOrders, PartnerState, PartnerUpdate, PartnerUpdateStatus, PartnerUpload, ProductFacetAPIView, ProductInfoAPIView, ProductSearchAPIView, RegisterAccount, LoginAccount, ShopListAPIView, CategoryListAPIView
 
 app_name = 'app'
 urlpatterns = [
@@ -11,11 +11,19 @@ urlpatterns = [
     path('user/password_reset', reset_password_request_token, name='password-reset'),
     path('user/password_reset/confirm', reset_password_confirm, name='password-reset-confirm'),
     path('productlist', ProductInfoAPIView.as_view(), name='product-list'),
+    path('productlist/facets', ProductFacetAPIView.as_view(), name='product-facets'),
+    path('catalog', CatalogAPIView.as_view(), name='catalog'),
+    path('bestoffers', BestOfferAPIView.as_view(), name='best-offers'),
+    path('export/<str:file_format>', ExportAPIView.as_view(), name='export'),
+    path('search', ProductSearchAPIView.as_view(), name='search'),
+    path('autocomplete', AutocompleteAPIView.as_view(), name='autocomplete'),
     path('shops', ShopListAPIView.as_view(), name='shops'),
     path('categories', CategoryListAPIView.as_view(), name='categories'),
     path('cart', CartAPIView.as_view(), name='cart'),
     path('order', OrderView.as_view(), name='order'),
     path('partner/update', PartnerUpdate.as_view(), name='partner-update'),
+    path('partner/upload', PartnerUpload.as_view(), name='partner-upload'),
+    path('partner/update/<int:job_id>', PartnerUpdateStatus.as_view(), name='partner-update-status'),
     path('partner/state', PartnerState.as_view(), name='partner-state'),
     path('partner/orders', PartnerOrders.as_view(), name='partner-orders'),
 ]
@@ -1,13 +1,13 @@
 from distutils.util import strtobool
 import json
-from django.http import JsonResponse
-from requests import get
+from django.http import JsonResponse, StreamingHttpResponse
 
 from django.conf import settings
-from django.db.models import Q, Sum, F
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, Value, When
+from django.db.models.fields.json import KeyTransform
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate, logout
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
@@ -19,31 +19,94 @@ from rest_framework.response import Response
 from rest_framework.request import Request
 
 from .models import (
+    BestOffer,
+    CatalogEntry,
     ConfirmEmailToken,
     Shop,
     Category,
     Contact,
+    ImportJob,
     Order,
     OrderItem,
-    Parameter,
-    Product,
     ProductInfo,
-    ProductParameter,
     User,
 )
 
 from .serializers import (
+    BestOfferSerializer,
+    CartItemSerializer,
+    CartItemUpdateSerializer,
+    CatalogEntrySerializer,
     CategorySerializer,
     ContactSerializer,
-    OrderItemSerializer,
+    ImportJobSerializer,
     OrderSerializer,
     ProductInfoSerializer,
     ShopSerializer,
     UserSerializer,
 )
+from app.autocomplete import suggest
+from app.cache import cached_catalog
+from app.exporters import EXPORTERS
+from app.fastpath import row_mapper
+from app.facets import facet_counts, filter_by_parameters, parse_parameter_filters
+from app.pagination import (
+    BestOfferCursorPagination,
+    CatalogCursorPagination,
+    DirectoryCursorPagination,
+    ProductInfoCursorPagination,
+    SearchPagination,
+)
+from app.readmodel import rebuild_best_offers
+from app.search import search_product_ids
+from app.shaping import parse_shape
 from app.signals import new_order
-from ujson import loads as load_json
-from yaml import load as load_yaml, Loader
+from app.tasks import fail_stale_jobs, submit_import
+from app.uploads import LimitedUploadHandler
+
+
+# Связи, которые нужно загрузить заранее для вложенных сериализаторов:
+# путь ORM -> путь поля в ответе
+PRODUCT_INFO_RELATED = {
+    "shop": "shop",
+    "product": "product",
+    "product__category": "product.category",
+}
+ORDER_RELATED = {
+    "ordered_items__product_info": "ordered_items.product_info",
+    "ordered_items__product_info__shop": "ordered_items.product_info.shop",
+    "ordered_items__product_info__product": "ordered_items.product_info.product",
+    "ordered_items__product_info__product__category": (
+        "ordered_items.product_info.product.category"
+    ),
+}
+ORDER_RELATED_MANY = {
+    "ordered_items": "ordered_items",
+    "ordered_items__product_info__product__category__shop": (
+        "ordered_items.product_info.product.category.shop"
+    ),
+}
+
+
+def product_info_related(queryset, shape):
+    """
+    select_related и prefetch_related для товаров под форму ответа
+    """
+    queryset = queryset.select_related(*shape.lookups(PRODUCT_INFO_RELATED))
+    if shape.wants("product.category.shop", expanded=False):
+        queryset = queryset.prefetch_related("product__category__shop")
+    return queryset
+
+
+def order_prefetches(shape):
+    """
+    prefetch_related для заказов под форму ответа
+    """
+    return shape.lookups(ORDER_RELATED) + [
+        lookup
+        for lookup, path in ORDER_RELATED_MANY.items()
+        if shape.wants(path, expanded=False)
+    ]
 
 
 class RegisterAccount(APIView):
@@ -150,8 +213,14 @@ class CategoryListAPIView(generics.ListAPIView):
     Класс для просмотра категорий
     """
 
-    queryset = Category.objects.all()
+    # магазины всех категорий страницы загружаются одним запросом
+    queryset = Category.objects.prefetch_related("shop")
     serializer_class = CategorySerializer
+    pagination_class = DirectoryCursorPagination
+
+    @cached_catalog()
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class ShopListAPIView(generics.ListAPIView):
@@ -161,6 +230,11 @@ class ShopListAPIView(generics.ListAPIView):
 
     queryset = Shop.objects.all()
     serializer_class = ShopSerializer
+    pagination_class = DirectoryCursorPagination
+
+    @cached_catalog()
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class ProductInfoAPIView(APIView):
@@ -168,19 +242,312 @@ class ProductInfoAPIView(APIView):
     Класс фильтрации продуктов и категорий
     """
 
+    pagination_class = ProductInfoCursorPagination
+
+    @cached_catalog(shop_param="shop_id")
     def get(self, request, format=None):
+        """
+        Retrieve a page of products filtered by shop, category and
+        product parameters.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing the page of products and
+          the next and previous page links.
+        """
+        try:
+            queryset = self.get_queryset(request)
+        except ValueError as error:
+            return JsonResponse(
+                {"Status": False, "Errors": str(error)},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        # строки собираются из values() без создания моделей
+        mapper = row_mapper(ProductInfoSerializer, parse_shape(request.query_params))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            mapper.values(queryset, "id", "price"), request, view=self
+        )
+
+        return paginator.get_paginated_response(mapper.map(page))
+
+    def get_queryset(self, request):
+        """
+        Build the product queryset from the request filters.
+
+        shop_id and category_id are combined with OR, as before;
+        parameter=<name>:<value> filters narrow the result further.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - QuerySet: The filtered ProductInfo queryset.
+
+        Raises:
+        - ValueError: A parameter filter is malformed.
+        """
         shop_id = request.query_params.get("shop_id")
         category_id = request.query_params.get("category_id")
-        query = Q(shop_id=shop_id) | Q(product__category_id=category_id)
-        queryset = (
-            ProductInfo.objects.filter(query)
-            .select_related("shop", "product__category")
-            .prefetch_related("product_parameters__parameter")
-            .distinct()
+        query = Q()
+        if shop_id is not None:
+            query |= Q(shop_id=shop_id)
+        if category_id is not None:
+            query |= Q(product__category_id=category_id)
+        queryset = ProductInfo.objects.filter(query)
+        filters = parse_parameter_filters(request.query_params)
+        return filter_by_parameters(queryset, filters)
+
+
+class ProductFacetAPIView(ProductInfoAPIView):
+    """
+    Класс подсчета товаров по значениям характеристик
+    """
+
+    @cached_catalog(shop_param="shop_id")
+    def get(self, request, format=None):
+        """
+        Count the products matching the catalog filters for each value
+        of each product parameter.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing the facet counts.
+        """
+        try:
+            queryset = self.get_queryset(request)
+        except ValueError as error:
+            return JsonResponse(
+                {"Status": False, "Errors": str(error)},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        return Response({"facets": facet_counts(queryset)})
+
+
+class CatalogAPIView(APIView):
+    """
+    Класс плоского списка каталога из таблицы для чтения
+    """
+
+    pagination_class = CatalogCursorPagination
+
+    # фильтры плоского каталога сужают выборку магазина, а не расширяют
+    @cached_catalog(shop_param="shop_id", cross_shop_params=())
+    def get(self, request, format=None):
+        """
+        Retrieve a page of flat catalog rows filtered by shop, category,
+        shop state and product parameters.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing the page of catalog rows and
+          the next and previous page links.
+        """
+        params = request.query_params
+        queryset = CatalogEntry.objects.all()
+        try:
+            if "shop_id" in params:
+                queryset = queryset.filter(shop_id=params["shop_id"])
+            if "category_id" in params:
+                queryset = queryset.filter(category_id=params["category_id"])
+            if "shop_state" in params:
+                queryset = queryset.filter(shop_state=strtobool(params["shop_state"]))
+            filters = parse_parameter_filters(params)
+        except ValueError as error:
+            return JsonResponse(
+                {"Status": False, "Errors": str(error)},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        for index, (name, values) in enumerate(filters.items()):
+            alias = f"parameter_{index}"
+            queryset = queryset.alias(
+                **{alias: KeyTransform(name, "parameters")}
+            ).filter(**{f"{alias}__in": values})
+
+        mapper = row_mapper(CatalogEntrySerializer, parse_shape(params))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            mapper.values(queryset, "product_info", "price"), request, view=self
         )
-        serializer = ProductInfoSerializer(queryset, many=True)
 
-        return Response(serializer.data)
+        return paginator.get_paginated_response(mapper.map(page))
+
+
+class BestOfferAPIView(APIView):
+    """
+    Класс для получения лучших предложений продуктов
+    """
+
+    pagination_class = BestOfferCursorPagination
+
+    @cached_catalog()
+    def get(self, request, format=None):
+        """
+        Retrieve a page of products with the lowest in-stock price among
+        enabled shops, the shop holding it and the number of offers.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing the page of best offers and
+          the next and previous page links.
+        """
+        queryset = BestOffer.objects.all()
+        category_id = request.query_params.get("category_id")
+        if category_id:
+            try:
+                queryset = queryset.filter(category_id=category_id)
+            except ValueError as error:
+                return JsonResponse(
+                    {"Status": False, "Errors": str(error)},
+                    status=400,
+                    json_dumps_params={"ensure_ascii": False},
+                )
+
+        mapper = row_mapper(BestOfferSerializer, parse_shape(request.query_params))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            mapper.values(queryset, "product", "price"), request, view=self
+        )
+
+        return paginator.get_paginated_response(mapper.map(page))
+
+
+class ExportAPIView(APIView):
+    """
+    Класс для потоковой выгрузки каталога
+    """
+
+    def get(self, request, file_format):
+        """
+        Stream the catalog filtered by shop and category as a file.
+
+        Args:
+        - request (Request): The Django request object.
+        - file_format (str): The export format: csv, jsonl or yaml.
+
+        Returns:
+        - StreamingHttpResponse: The response streaming the catalog file.
+        """
+        if file_format not in EXPORTERS:
+            return JsonResponse(
+                {
+                    "Status": False,
+                    "Errors": f"Формат выгрузки: {', '.join(EXPORTERS)}",
+                },
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        exporter, content_type, extension = EXPORTERS[file_format]
+
+        params = request.query_params
+        queryset = ProductInfo.objects.all()
+        shop = None
+        try:
+            if "shop_id" in params:
+                shop = Shop.objects.filter(id=params["shop_id"]).first()
+                queryset = queryset.filter(shop_id=params["shop_id"])
+            if "category_id" in params:
+                queryset = queryset.filter(product__category_id=params["category_id"])
+        except ValueError as error:
+            return JsonResponse(
+                {"Status": False, "Errors": str(error)},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        if file_format == "yaml" and shop is None:
+            return JsonResponse(
+                {"Status": False, "Errors": "Для YAML укажите shop_id"},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        response = StreamingHttpResponse(
+            exporter(queryset, shop), content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="catalog{extension}"'
+        return response
+
+
+class ProductSearchAPIView(APIView):
+    """
+    Класс полнотекстового поиска товаров
+    """
+
+    pagination_class = SearchPagination
+
+    @cached_catalog()
+    def get(self, request, format=None):
+        """
+        Search products by name, model, category and parameter values.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing a page of products ordered
+          by relevance.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return JsonResponse(
+                {"Status": False, "Errors": "Не указан поисковый запрос"},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        shape = parse_shape(request.query_params)
+        paginator = self.pagination_class()
+        ids = paginator.paginate_queryset(search_product_ids(query), request, view=self)
+        product_infos = product_info_related(ProductInfo.objects, shape).in_bulk(ids)
+        serializer = ProductInfoSerializer(
+            [product_infos[pk] for pk in ids if pk in product_infos],
+            many=True,
+            shape=shape,
+        )
+
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AutocompleteAPIView(APIView):
+    """
+    Класс подсказок по названиям товаров и категорий
+    """
+
+    max_limit = 50
+
+    def get(self, request, format=None):
+        """
+        Suggest product and category names starting with the typed text.
+
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - Response: The response containing the suggestions.
+        """
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), self.max_limit)
+        except ValueError:
+            return JsonResponse(
+                {"Status": False, "Errors": "Неверный формат limit"},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        query = request.query_params.get("q", "")
+        return Response({"results": suggest(query, max(limit, 1))})
 
 
 class CartAPIView(APIView):
@@ -220,12 +587,10 @@ class CartAPIView(APIView):
             return JsonResponse(
                 {"Status": False, "Error": "Log in required"}, status=403
             )
+        shape = parse_shape(request.query_params)
         basket = (
             Order.objects.filter(user_id=request.user.id, state="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
+            .prefetch_related(*order_prefetches(shape))
             .annotate(
                 total_sum=Sum(
                     F("ordered_items__quantity")
@@ -235,7 +600,7 @@ class CartAPIView(APIView):
             .distinct()
         )
 
-        serializer = OrderSerializer(basket, many=True)
+        serializer = OrderSerializer(basket, many=True, shape=shape)
         return Response(serializer.data)
 
     def post(self, request, *args, **kwargs):
@@ -254,46 +619,80 @@ class CartAPIView(APIView):
             )
 
         items_sting = request.data.get("items")
-        print(request.data)
-        print(type(items_sting))
         if items_sting:
             try:
-                items_dict = json.loads(items_sting)
-            except ValueError as e:
-                print(e)
+                items = (
+                    json.loads(items_sting)
+                    if isinstance(items_sting, str)
+                    else items_sting
+                )
+            except ValueError:
                 return JsonResponse(
                     {"Status": False, "Errors": "Неверный формат запроса"},
                     json_dumps_params={"ensure_ascii": False},
                 )
-            else:
-                basket, _ = Order.objects.filter(
-                    user_id=request.user.id, state="basket"
+            serializer = CartItemSerializer(data=items, many=True)
+            if not serializer.is_valid():
+                return JsonResponse(
+                    {"Status": False, "Errors": serializer.errors},
+                    json_dumps_params={"ensure_ascii": False},
                 )
-                objects_created = 0
-                for order_item in items_dict:
-                    order_item.update({"order": basket.id})
-                    serializer = OrderItemSerializer(data=order_item)
-                    if serializer.is_valid():
-                        try:
-                            serializer.save()
-                        except IntegrityError as error:
-                            print(error)
-                            return JsonResponse(
-                                {"Status": False, "Errors": str(error)},
-                                json_dumps_params={"ensure_ascii": False},
-                            )
-                        else:
-                            objects_created += 1
 
-                    else:
+            lines = serializer.validated_data
+            # все товары строк проверяются одним запросом
+            shops = dict(
+                ProductInfo.objects.filter(
+                    id__in={line["product_info"] for line in lines},
+                    shop__state=True,
+                ).values_list("id", "shop_id")
+            )
+            errors = [
+                (
+                    {}
+                    if line["product_info"] in shops
+                    else {
+                        "product_info": [
+                            "Товар не найден или магазин не принимает заказы"
+                        ]
+                    }
+                )
+                for line in lines
+            ]
+            if any(errors):
+                return JsonResponse(
+                    {"Status": False, "Errors": errors},
+                    json_dumps_params={"ensure_ascii": False},
+                )
 
-                        return JsonResponse(
-                            {"Status": False, "Errors": serializer.errors}
+            # повторы товара в запросе складываются в одну позицию
+            quantities = {}
+            for line in lines:
+                quantities[line["product_info"]] = (
+                    quantities.get(line["product_info"], 0) + line["quantity"]
+                )
+            with transaction.atomic():
+                basket, _ = Order.objects.get_or_create(
+                    user_id=request.user.id, state="basket"
+                )
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(
+                            order_id=basket.id,
+                            product_info_id=product_info_id,
+                            shop_id=shops[product_info_id],
+                            quantity=quantity,
                         )
-
-                return JsonResponse(
-                    {"Status": True, "Создано объектов": objects_created}
+                        for product_info_id, quantity in quantities.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["order", "product_info"],
+                    update_fields=["quantity"],
                 )
+
+            return JsonResponse(
+                {"Status": True, "Создано объектов": len(quantities)},
+                json_dumps_params={"ensure_ascii": False},
+            )
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             json_dumps_params={"ensure_ascii": False},
@@ -346,7 +745,8 @@ class CartAPIView(APIView):
         - request (Request): The Django request object.
 
         Returns:
-        - JsonResponse: The response indicating the status of the operation and any errors.
+        - JsonResponse: The response indicating the status of the operation,
+          the updated basket total and any errors.
         """
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -356,30 +756,73 @@ class CartAPIView(APIView):
         items_sting = request.data.get("items")
         if items_sting:
             try:
-                items_dict = load_json(items_sting)
+                items = (
+                    json.loads(items_sting)
+                    if isinstance(items_sting, str)
+                    else items_sting
+                )
             except ValueError:
                 return JsonResponse(
-                    {"Status": False, "Errors": "Неверный формат запроса"}
+                    {"Status": False, "Errors": "Неверный формат запроса"},
+                    json_dumps_params={"ensure_ascii": False},
                 )
-            else:
+            serializer = CartItemUpdateSerializer(data=items, many=True)
+            if not serializer.is_valid():
+                return JsonResponse(
+                    {"Status": False, "Errors": serializer.errors},
+                    json_dumps_params={"ensure_ascii": False},
+                )
+
+            lines = serializer.validated_data
+            quantities = {line["id"]: line["quantity"] for line in lines}
+            with transaction.atomic():
                 basket, _ = Order.objects.get_or_create(
                     user_id=request.user.id, state="basket"
                 )
-                objects_updated = 0
-                for order_item in items_dict:
-                    if (
-                        isinstance(order_item["id"], int)
-                        and isinstance(order_item["quantity"], int)
-                    ):
-                        objects_updated += OrderItem.objects.filter(
-                            order_id=basket.id, id=order_item["id"]
-                        ).update(quantity=order_item["quantity"])
+                items = OrderItem.objects.filter(order_id=basket.id)
+                # все позиции строк проверяются одним запросом
+                found = set(
+                    items.filter(id__in=quantities).values_list("id", flat=True)
+                )
+                errors = [
+                    (
+                        {}
+                        if line["id"] in found
+                        else {"id": ["Позиция не найдена в корзине"]}
+                    )
+                    for line in lines
+                ]
+                if any(errors):
+                    return JsonResponse(
+                        {"Status": False, "Errors": errors},
+                        json_dumps_params={"ensure_ascii": False},
+                    )
 
-                return JsonResponse(
-                    {"Status": True, "Обновлено объектов": objects_updated}
+                # все количества меняются одним UPDATE ... CASE
+                objects_updated = items.filter(id__in=quantities).update(
+                    quantity=Case(
+                        *(
+                            When(id=order_item_id, then=Value(quantity))
+                            for order_item_id, quantity in quantities.items()
+                        ),
+                        output_field=PositiveIntegerField(),
+                    )
                 )
+                total_sum = items.aggregate(
+                    total_sum=Sum(F("quantity") * F("product_info__price"))
+                )["total_sum"]
+
+            return JsonResponse(
+                {
+                    "Status": True,
+                    "Обновлено объектов": objects_updated,
+                    "total_sum": total_sum or 0,
+                },
+                json_dumps_params={"ensure_ascii": False},
+            )
         return JsonResponse(
-            {"Status": False, "Errors": "Не указаны все необходимые аргументы"}
+            {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+            json_dumps_params={"ensure_ascii": False},
         )
 
 
@@ -509,14 +952,12 @@ class OrderView(APIView):
             return JsonResponse(
                 {"Status": False, "Error": "Log in required"}, status=403
             )
+        shape = parse_shape(request.query_params)
         order = (
             Order.objects.filter(user_id=request.user.id)
             .exclude(state="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .select_related("contact")
+            .prefetch_related(*order_prefetches(shape))
+            .select_related(*shape.lookups({"contact": "contact"}))
             .annotate(
                 total_sum=Sum(
                     F("ordered_items__quantity")
@@ -526,7 +967,7 @@ class OrderView(APIView):
             .distinct()
         )
 
-        serializer = OrderSerializer(order, many=True)
+        serializer = OrderSerializer(order, many=True, shape=shape)
         return Response(serializer.data)
 
     def post(self, request, *args, **kwargs):
@@ -599,11 +1040,6 @@ class PartnerOrders(APIView):
                 ordered_items__product_info__shop__user_id=request.user.id
             )
             .exclude(state="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product__category",
-                "ordered_items__product_info__product_parameters__parameter",
-            )
-            .select_related("contact")
             .annotate(
                 total_sum=Sum(
                     F("ordered_items__quantity")
@@ -613,8 +1049,9 @@ class PartnerOrders(APIView):
             .distinct()
         )
 
-        serializer = OrderSerializer(order, many=True)
-        return Response(serializer.data)
+        # строки собираются из values() без создания моделей
+        mapper = row_mapper(OrderSerializer, parse_shape(request.query_params))
+        return Response(mapper.map(list(mapper.values(order))))
 
 
 class ConfirmAccount(APIView):
@@ -655,15 +1092,25 @@ class ConfirmAccount(APIView):
 
 
 class PartnerUpdate(APIView):
+    """
+    Класс для обновления прайса от поставщика
+
+    Methods:
+    - post: Queue a price list import.
+
+    Attributes:
+    - None
+    """
+
     def post(self, request):
         """
-        Update the partner price list information.
+        Queue an update of the partner price list information.
 
         Args:
         - request (Request): The Django request object.
 
         Returns:
-        - JsonResponse: The response indicating the status of the operation and any errors.
+        - JsonResponse: The response containing the import job id or errors.
         """
         if not request.user.is_authenticated:
             return JsonResponse(
@@ -690,44 +1137,69 @@ class PartnerUpdate(APIView):
                     json_dumps_params={"ensure_ascii": False},
                 )
             else:
-                stream = get(url).content
+                job = ImportJob.objects.create(user=request.user, url=url)
+                submit_import(job)
+                return JsonResponse({"Status": True, "Job": job.id}, status=202)
+
+        return JsonResponse(
+            {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+            json_dumps_params={"ensure_ascii": False},
+        )
 
-                data = load_yaml(stream, Loader=Loader)
 
-                shop, _ = Shop.objects.get_or_create(
-                    name=data.get("shop"), url=data.get("url", "")
-                )
+class PartnerUpload(APIView):
+    """
+    Класс для загрузки прайса файлом
 
-                for category in data.get("categories", []):
-                    category_object, _ = Category.objects.get_or_create(
-                        name=category.get("name")
-                    )
-                category_object.shop.add(shop)
+    Methods:
+    - post: Upload a price list file and queue its import.
 
-                for item in data.get("goods", []):
-                    product_object, _ = Product.objects.get_or_create(
-                        name=item.get("name"), category=category_object
-                    )
+    Attributes:
+    - None
+    """
 
-                product_info_object = ProductInfo.objects.create(
-                    product=product_object,
-                    external_id=item.get("id"),
-                    model=item.get("model"),
-                    price=item.get("price"),
-                    price_rrc=item.get("price_rrc"),
-                    quantity=item.get("quantity"),
-                    shop=shop,
-                )
+    def initialize_request(self, request, *args, **kwargs):
+        """
+        Сохраняем загружаемый файл на диск частями, не держа его в памяти
+        и прерывая загрузку больше IMPORT_MAX_SIZE
+        """
+        self.upload_handler = LimitedUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
 
-                for key, value in item.get("parameters", {}).items():
-                    parameter_object, _ = Parameter.objects.get_or_create(name=key)
-                    ProductParameter.objects.create(
-                        product_info=product_info_object,
-                        parameter=parameter_object,
-                        value=value,
-                    )
+    def post(self, request, *args, **kwargs):
+        """
+        Upload a partner price list file and queue its import.
 
-                return JsonResponse({"Status": True})
+        Args:
+        - request (Request): The Django request object.
+
+        Returns:
+        - JsonResponse: The response containing the import job id or errors.
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Log in required"}, status=403
+            )
+
+        if request.user.type != "shop":
+            return JsonResponse(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=403,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        file = request.FILES.get("file")
+        if self.upload_handler.too_large:
+            return JsonResponse(
+                {"Status": False, "Error": "Прайс-лист превышает допустимый размер"},
+                status=413,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        if file:
+            job = ImportJob.objects.create(user=request.user, file=file)
+            submit_import(job)
+            return JsonResponse({"Status": True, "Job": job.id}, status=202)
 
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
@@ -735,6 +1207,48 @@ class PartnerUpdate(APIView):
         )
 
 
+class PartnerUpdateStatus(APIView):
+    """
+    Класс для получения хода импорта прайса
+
+    Methods:
+    - get: Retrieve the progress of a queued import.
+
+    Attributes:
+    - None
+    """
+
+    def get(self, request, job_id):
+        """
+        Retrieve the progress of a price list import.
+
+        Args:
+        - request (Request): The Django request object.
+        - job_id (int): The import job id.
+
+        Returns:
+        - Response: The response containing the import job state.
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Log in required"}, status=403
+            )
+
+        jobs = ImportJob.objects.filter(id=job_id, user_id=request.user.id)
+        # задача, потерянная вместе с процессом, не висит в работе вечно
+        fail_stale_jobs(jobs)
+        job = jobs.first()
+        if not job:
+            return JsonResponse(
+                {"Status": False, "Error": "Задача не найдена"},
+                status=404,
+                json_dumps_params={"ensure_ascii": False},
+            )
+
+        serializer = ImportJobSerializer(job)
+        return Response(serializer.data)
+
+
 class PartnerState(APIView):
     """
     A class for managing partner state.
@@ -793,9 +1307,21 @@ class PartnerState(APIView):
         state = request.data.get("state")
         if state:
             try:
-                Shop.objects.filter(user_id=request.user.id).update(
-                    state=strtobool(state)
-                )
+                state = strtobool(state)
+                with transaction.atomic():
+                    Shop.objects.filter(user_id=request.user.id).update(
+                        state=state, catalog_version=F("catalog_version") + 1
+                    )
+                    CatalogEntry.objects.filter(shop__user_id=request.user.id).update(
+                        shop_state=state
+                    )
+                    rebuild_best_offers(
+                        list(
+                            Shop.objects.filter(user_id=request.user.id).values_list(
+                                "id", flat=True
+                            )
+                        )
+                    )
                 return JsonResponse({"Status": True})
             except ValueError as error:
                 return JsonResponse({"Status": False, "Errors": str(error)})
@@ -148,6 +148,49 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'app.User'
 
+# Число товаров прайс-листа, записываемых за одну пачку
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+# Секунды, после которых строки прерванного импорта удаляются
+# из временной таблицы; должно быть больше самого долгого импорта
+IMPORT_STAGE_TTL = int(os.getenv('IMPORT_STAGE_TTL', 24 * 60 * 60))
+# Число процессов для фоновых задач импорта
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', 2))
+# Секунды без прогресса, после которых задача импорта в очереди или
+# в работе считается прерванной (перезапуск процесса, падение пула)
+IMPORT_JOB_TIMEOUT = int(os.getenv('IMPORT_JOB_TIMEOUT', 60 * 60))
+# Ограничения загрузки прайс-листа по ссылке: секунды и байты
+IMPORT_CONNECT_TIMEOUT = float(os.getenv('IMPORT_CONNECT_TIMEOUT', 5))
+IMPORT_READ_TIMEOUT = float(os.getenv('IMPORT_READ_TIMEOUT', 30))
+IMPORT_FETCH_DEADLINE = float(os.getenv('IMPORT_FETCH_DEADLINE', 600))
+IMPORT_MAX_SIZE = int(os.getenv('IMPORT_MAX_SIZE', 500 * 1024 * 1024))
+# Число товаров, читаемых из базы за одну пачку при выгрузке каталога
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Кэш ответов каталога. По умолчанию в памяти процесса с вытеснением
+# давно не читанных записей (LRU) после CATALOG_CACHE_SIZE записей; общий
+# для процессов кэш - например, django.core.cache.backends.redis.RedisCache
+# с адресом в CATALOG_CACHE_LOCATION и maxmemory-policy allkeys-lru
+CATALOG_CACHE_BACKEND = os.getenv(
+    'CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'OPTIONS': (
+            {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_SIZE', 1000))}
+            if CATALOG_CACHE_BACKEND.endswith('LocMemCache')
+            else {}
+        ),
+    },
+}
+CATALOG_CACHE = 'catalog'
+# Время жизни записи в секундах; устаревание определяется версией каталога
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 3600))
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_AUTHENTICATION_CLASSES': (